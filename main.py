@@ -7,14 +7,27 @@ Archivo principal que orquesta el flujo de la entrevista.
 """
 
 import os
+import re
 import argparse
+import asyncio
+import threading
 import time
 from termcolor import colored
-from modules.whisper_stt import grabar_y_transcribir
-from modules.coqui_tts import texto_a_voz
-from modules.llm_conversacion import generar_pregunta
+from modules.whisper_stt import grabar_y_transcribir, preparar_grabacion
+from modules.coqui_tts import texto_a_voz, crear_reproductor
+from modules.llm_conversacion import (generar_pregunta_stream, generar_pregunta_stream_cubierta,
+                                     PREGUNTAS_RESPALDO)
+from modules.llm_cache import crear_cache_semantica
 from modules.entrevista_logger import EntrevistaLogger
 
+# Frases con las que el entrevistador indica que la entrevista ha terminado
+_TERMINACION_RE = re.compile(r"gracias por tu tiempo|finalizar", re.IGNORECASE)
+
+# Fin de frase: a partir de aquí el texto acumulado se envía al TTS
+_FIN_FRASE_RE = re.compile(r'[.?!]\s*$')
+# Máximo de fragmentos acumulados antes de enviar texto al TTS aunque no acabe la frase
+_MAX_FRAGMENTOS_FRASE = 80
+
 def limpiar_pantalla():
     """Limpia la pantalla de la terminal."""
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -40,21 +53,110 @@ def mostrar_instrucciones():
     print(colored("\n[INFO] La entrevista comenzará en breve...", 'yellow'))
     time.sleep(3)
 
-def ejecutar_entrevista(usar_tts=False, modelo_llm='claude'):
+def esperar_enter(mensaje):
+    """
+    Espera a que el usuario presione ENTER sin bloquear el bucle de eventos.
+    
+    La lectura se hace en un hilo daemon para que CTRL+C pueda cancelar la
+    espera aunque el usuario no haya presionado ENTER.
+    
+    Args:
+        mensaje (str): Texto que se muestra al usuario.
+        
+    Returns:
+        asyncio.Future: Futuro que se completa al presionar ENTER.
+    """
+    loop = asyncio.get_running_loop()
+    futuro = loop.create_future()
+    
+    def completar():
+        if not futuro.done():
+            futuro.set_result(None)
+    
+    def leer():
+        try:
+            input(mensaje)
+        except EOFError:
+            pass
+        try:
+            loop.call_soon_threadsafe(completar)
+        except RuntimeError:
+            # El bucle de eventos ya se cerró
+            pass
+    
+    threading.Thread(target=leer, daemon=True).start()
+    return futuro
+
+def mostrar_y_reproducir(fragmentos, reproductor=None, detener=None):
+    """
+    Muestra la siguiente pregunta a medida que llegan sus fragmentos.
+    
+    Cada frase completa se envía al reproductor de voz en cuanto termina, sin
+    esperar a que el modelo genere la pregunta entera.
+    
+    Args:
+        fragmentos (Iterable[str]): Fragmentos de la pregunta (p. ej. del LLM en streaming).
+        reproductor (ReproductorVoz, opcional): Reproductor al que enviar las frases.
+        detener (threading.Event, opcional): Si se activa, se deja de mostrar la
+            pregunta y se cierra el stream de fragmentos.
+        
+    Returns:
+        str: La pregunta completa.
+    """
+    print(colored("\n[Entrevistador]: ", 'green'), end='', flush=True)
+    
+    partes = []
+    frase = ""
+    fragmentos_frase = 0
+    
+    for fragmento in fragmentos:
+        if detener is not None and detener.is_set():
+            # Cerrar el generador libera la conexión con el LLM
+            if hasattr(fragmentos, 'close'):
+                fragmentos.close()
+            break
+        
+        print(colored(fragmento, 'green'), end='', flush=True)
+        partes.append(fragmento)
+        
+        if reproductor is None:
+            continue
+        
+        frase += fragmento
+        fragmentos_frase += 1
+        if _FIN_FRASE_RE.search(frase) or fragmentos_frase > _MAX_FRAGMENTOS_FRASE:
+            reproductor.decir(frase.strip())
+            frase = ""
+            fragmentos_frase = 0
+    
+    if reproductor is not None and frase.strip() and not (detener is not None and detener.is_set()):
+        reproductor.decir(frase.strip())
+    
+    print()
+    return "".join(partes).strip()
+
+async def ejecutar_entrevista(usar_tts=False, modelo_llm='claude', stt_por_lotes=False, usar_cache=False,
+                              modelo_respaldo=None):
     """
     Ejecuta el flujo principal de la entrevista.
     
+    Las llamadas bloqueantes (grabación, LLM, TTS y disco) se ejecutan en hilos
+    para que la reproducción de la pregunta se solape con la espera del ENTER y
+    el guardado de la conversación con la llamada al LLM.
+    
     Args:
         usar_tts (bool): Si es True, utiliza síntesis de voz para las preguntas.
         modelo_llm (str): Modelo LLM a utilizar ('claude', 'gpt', etc.)
+        stt_por_lotes (bool): Si es True, transcribe las respuestas por lotes con faster-whisper.
+        usar_cache (bool): Si es True, reutiliza preguntas ya generadas para respuestas
+            prácticamente iguales a la misma pregunta (caché semántica).
+        modelo_respaldo (str, opcional): Segundo modelo LLM. Si se indica, cada pregunta se
+            pide a ambos modelos en paralelo y se usa la primera respuesta.
     """
     limpiar_pantalla()
     mostrar_banner()
     
-    # Crear carpeta de transcripciones si no existe
-    os.makedirs('transcripts', exist_ok=True)
-    
-    # Inicializar el logger de la entrevista
+    # Inicializar el logger de la entrevista (crea la carpeta de transcripciones)
     logger = EntrevistaLogger()
     
     # Cargar el prompt base
@@ -67,8 +169,21 @@ def ejecutar_entrevista(usar_tts=False, modelo_llm='claude'):
     
     print(colored(f"\n[Entrevistador]: {pregunta_inicial}", 'green'))
     
+    # Cargar Whisper y preparar el micrófono mientras suena la primera pregunta
+    preparacion = asyncio.create_task(
+        asyncio.to_thread(preparar_grabacion, por_lotes=stt_por_lotes)
+    )
+    
+    # Señal para que los hilos de grabación, streaming y voz terminen al salir con
+    # CTRL+C (asyncio.run espera a que acaben antes de cerrar el programa)
+    detener = threading.Event()
+    
+    # La reproducción corre en segundo plano mientras se espera el ENTER
+    reproduccion = None
     if usar_tts:
-        texto_a_voz(pregunta_inicial)
+        reproduccion = asyncio.create_task(
+            asyncio.to_thread(texto_a_voz, pregunta_inicial, detener=detener)
+        )
     
     # Añadir pregunta inicial a la conversación
     conversacion.append({
@@ -76,14 +191,34 @@ def ejecutar_entrevista(usar_tts=False, modelo_llm='claude'):
         "texto": pregunta_inicial
     })
     
+    # Caché semántica de preguntas (opcional)
+    cache = await asyncio.to_thread(crear_cache_semantica) if usar_cache else None
+    
+    # Tarea de guardado en segundo plano (se espera antes de lanzar la siguiente)
+    guardado = None
+    
     try:
         while True:
             # Esperar a que el usuario presione ENTER para hablar
-            input(colored("\n[Presiona ENTER para responder...]", 'yellow'))
+            await esperar_enter(colored("\n[Presiona ENTER para responder...]", 'yellow'))
+            
+            # No grabar mientras el entrevistador sigue hablando
+            if reproduccion is not None:
+                await reproduccion
+                reproduccion = None
+            
+            # Esperar la preparación de la grabación (normalmente ya terminó)
+            if preparacion is not None:
+                try:
+                    await preparacion
+                except Exception as e:
+                    print(colored(f"\n[AVISO] No se pudo preparar la grabación: {str(e)}", 'red'))
+                preparacion = None
             
             # Grabar y transcribir la respuesta del candidato
             print(colored("\n[Grabando tu respuesta...]", 'yellow'))
-            respuesta = grabar_y_transcribir()
+            respuesta = await asyncio.to_thread(grabar_y_transcribir, por_lotes=stt_por_lotes,
+                                               detener=detener)
             
             if not respuesta.strip():
                 print(colored("\n[No se detectó ninguna respuesta. Intenta de nuevo.]", 'red'))
@@ -98,44 +233,81 @@ def ejecutar_entrevista(usar_tts=False, modelo_llm='claude'):
                 "texto": respuesta
             })
             
-            # Guardar la conversación hasta el momento
-            logger.guardar_conversacion(conversacion)
+            # Guardar la conversación hasta el momento mientras se consulta al LLM
+            if guardado is not None:
+                await guardado
+            guardado = asyncio.create_task(
+                asyncio.to_thread(logger.guardar_conversacion, list(conversacion))
+            )
+            
+            # Buscar una pregunta ya generada para una respuesta equivalente
+            pregunta_cacheada = None
+            if cache is not None:
+                contexto = cache.hash_contexto(conversacion, prompt_base)
+                pregunta_cacheada, embedding = await asyncio.to_thread(
+                    cache.consultar, respuesta, contexto, historial=conversacion[:-1]
+                )
+            
+            # Generar nueva pregunta basada en la conversación, mostrándola y
+            # reproduciéndola frase a frase a medida que llega
+            if pregunta_cacheada is not None:
+                fragmentos = [pregunta_cacheada]
+            elif modelo_respaldo and modelo_respaldo != modelo_llm:
+                fragmentos = generar_pregunta_stream_cubierta(
+                    conversacion, prompt_base, [modelo_llm, modelo_respaldo]
+                )
+            else:
+                fragmentos = generar_pregunta_stream(conversacion, prompt_base, modelo_llm)
             
-            # Generar nueva pregunta basada en la conversación
-            nueva_pregunta = generar_pregunta(conversacion, prompt_base, modelo_llm)
+            reproductor = await asyncio.to_thread(crear_reproductor, detener) if usar_tts else None
+            nueva_pregunta = await asyncio.to_thread(mostrar_y_reproducir, fragmentos, reproductor, detener)
+            if reproductor is not None:
+                reproduccion = asyncio.create_task(asyncio.to_thread(reproductor.esperar))
             
             # Revisar si la entrevista debe terminar
-            if "gracias por tu tiempo" in nueva_pregunta.lower() or "finalizar" in nueva_pregunta.lower():
-                print(colored(f"\n[Entrevistador]: {nueva_pregunta}", 'green'))
-                if usar_tts:
-                    texto_a_voz(nueva_pregunta)
+            terminar = _TERMINACION_RE.search(nueva_pregunta)
+            
+            # Cachear la pregunta nueva (salvo las de respaldo y la de cierre)
+            if (cache is not None and pregunta_cacheada is None and not terminar
+                    and nueva_pregunta not in PREGUNTAS_RESPALDO):
+                cache.agregar(embedding, contexto, nueva_pregunta)
+            
+            if terminar:
                 conversacion.append({
                     "rol": "entrevistador",
                     "texto": nueva_pregunta
                 })
-                logger.guardar_conversacion(conversacion)
+                await guardado
+                guardado = asyncio.create_task(
+                    asyncio.to_thread(logger.guardar_conversacion, list(conversacion))
+                )
+                if reproduccion is not None:
+                    await reproduccion
+                await guardado
                 print(colored("\n[INFO] La entrevista ha finalizado.", 'yellow'))
                 break
             
-            # Mostrar la nueva pregunta
-            print(colored(f"\n[Entrevistador]: {nueva_pregunta}", 'green'))
-            
-            if usar_tts:
-                texto_a_voz(nueva_pregunta)
-            
             # Añadir pregunta a la conversación
             conversacion.append({
                 "rol": "entrevistador",
                 "texto": nueva_pregunta
             })
             
-    except KeyboardInterrupt:
+    except (KeyboardInterrupt, asyncio.CancelledError):
         # Capturar Ctrl+C para finalizar graciosamente
+        detener.set()
         print(colored("\n\n[INFO] Entrevista finalizada por el usuario.", 'yellow'))
         
-        # Guardar la conversación final
+        # Guardar la conversación final (después de cualquier guardado pendiente)
+        if guardado is not None:
+            await guardado
         logger.guardar_conversacion(conversacion)
         print(colored(f"\n[INFO] Transcripción guardada en: {logger.archivo_salida}", 'yellow'))
+    
+    finally:
+        logger.cerrar()
+        if cache is not None:
+            cache.guardar()
 
 def main():
     """Punto de entrada principal del programa."""
@@ -143,11 +315,26 @@ def main():
     parser.add_argument('--tts', action='store_true', help='Utilizar síntesis de voz (TTS)')
     parser.add_argument('--modelo', type=str, default='meta-llama', choices=['claude', 'gpt'], 
                         help='Modelo LLM a utilizar (meta-llama,claude, gpt)')
+    parser.add_argument('--stt-lotes', action='store_true',
+                        help='Transcribir por lotes con faster-whisper (más rápido en respuestas largas)')
+    parser.add_argument('--modelo-respaldo', type=str, default=None,
+                        help='Segundo modelo LLM consultado en paralelo; se usa la respuesta más rápida')
+    parser.add_argument('--cache', action='store_true',
+                        help='Reutilizar preguntas ya generadas para respuestas equivalentes')
     
     args = parser.parse_args()
     
+    # Usar uvloop como bucle de eventos si está disponible (no existe en Windows)
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     mostrar_instrucciones()
-    ejecutar_entrevista(usar_tts=args.tts, modelo_llm=args.modelo)
+    asyncio.run(ejecutar_entrevista(usar_tts=args.tts, modelo_llm=args.modelo,
+                                    stt_por_lotes=args.stt_lotes, usar_cache=args.cache,
+                                    modelo_respaldo=args.modelo_respaldo))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
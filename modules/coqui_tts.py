@@ -7,9 +7,15 @@ Convierte texto a voz y reproduce el audio.
 """
 
 import os
+import time
+import atexit
+import queue
+import threading
+import collections
+import contextlib
 import numpy as np
+import torch
 import sounddevice as sd
-import soundfile as sf
 from scipy.io.wavfile import write
 # Importaciones para la versión actual de Coqui TTS
 try:
@@ -24,6 +30,28 @@ except ImportError:
         print("No se pudo importar los módulos necesarios de Coqui TTS.")
         raise
 
+# Directorios para los audios temporales y los modelos
+os.makedirs('temp', exist_ok=True)
+os.makedirs('models', exist_ok=True)
+
+# Instancia compartida del sintetizador (el modelo se carga una sola vez)
+_SINTETIZADOR = None
+_SINTETIZADOR_LOCK = threading.Lock()
+
+# Frase y nivel mínimo (RMS) para validar el audio del modelo cuantizado
+TEXTO_VALIDACION = "Hola, esta es una prueba de voz."
+UMBRAL_RMS_VALIDACION = 1e-3
+
+# Frecuencia de muestreo del modelo por defecto (tts_models/es/css10/vits)
+FRECUENCIA_SALIDA = 22050
+
+# Margen (segundos) sobre la duración del audio pendiente al esperar a que suene
+MARGEN_ESPERA_SALIDA = 2.0
+
+# Salida de audio compartida (el stream se abre una sola vez)
+_SALIDA = None
+_SALIDA_LOCK = threading.Lock()
+
 class CoquiSintetizador:
     """Clase para manejar la síntesis de voz con Coqui TTS."""
     
@@ -35,8 +63,7 @@ class CoquiSintetizador:
             modelo (str): Identificador del modelo TTS a usar.
             vocoder (str, opcional): Identificador del vocoder.
         """
-        # Crear directorio para modelos si no existe
-        os.makedirs('models', exist_ok=True)
+        self.usar_cuda = torch.cuda.is_available()
         
         try:
             print(f"Intentando inicializar TTS con modelo: {modelo}")
@@ -44,7 +71,7 @@ class CoquiSintetizador:
             # Intentar usar la API moderna de TTS primero
             try:
                 # Enfoque para versiones más nuevas de TTS
-                self.tts = TTS(model_name=modelo, progress_bar=True)
+                self.tts = TTS(model_name=modelo, progress_bar=True).to("cuda" if self.usar_cuda else "cpu")
                 self.use_new_api = True
                 print("Usando la API moderna de TTS")
             except (NameError, AttributeError):
@@ -75,16 +102,87 @@ class CoquiSintetizador:
                     "tts_config_path": self.config_path,
                     "vocoder_checkpoint": self.vocoder_path,
                     "vocoder_config": self.vocoder_config_path,
-                    "use_cuda": False
+                    "use_cuda": self.usar_cuda
                 }
                 
                 # Crear el sintetizador con la configuración como diccionario
                 self.synthesizer = Synthesizer(**synth_config)
+            
+            self._optimizar_modelo()
                 
         except Exception as e:
             print(f"Error al inicializar el sintetizador: {str(e)}")
             raise
     
+    def _optimizar_modelo(self):
+        """
+        Acelera la inferencia del modelo según el hardware disponible.
+        
+        En GPU compila la inferencia con torch.compile (se ejecuta después en FP16,
+        ver `_contexto_inferencia`); en CPU cuantiza dinámicamente las capas
+        lineales a INT8. Si la optimización falla se mantiene el modelo original.
+        """
+        synthesizer = self.tts.synthesizer if self.use_new_api else self.synthesizer
+        modelo = synthesizer.tts_model
+        
+        try:
+            if self.usar_cuda:
+                # Se compila el método de inferencia porque Coqui lo invoca directamente.
+                # Modo "default" (sin CUDA graphs): la síntesis se llama desde varios hilos
+                modelo.inference = torch.compile(modelo.inference, mode="default", fullgraph=False, dynamic=True)
+                
+                # torch.compile es perezoso: los errores de compilación (p. ej. falta
+                # Triton) solo aparecen en la primera llamada, así que se sintetiza ya
+                if self._audio_valido():
+                    print("Inferencia TTS compilada con torch.compile (CUDA, FP16)")
+                else:
+                    del modelo.inference
+                    print("No se pudo compilar la inferencia TTS, se usará sin compilar")
+            else:
+                synthesizer.tts_model = torch.quantization.quantize_dynamic(
+                    modelo, {torch.nn.Linear}, dtype=torch.qint8
+                )
+                if self._audio_valido():
+                    print("Modelo TTS cuantizado a INT8 (CPU)")
+                else:
+                    synthesizer.tts_model = modelo
+                    print("La cuantización INT8 degrada el audio, se usará el modelo sin cuantizar")
+        except Exception as e:
+            synthesizer.tts_model = modelo
+            if "inference" in vars(modelo):
+                del modelo.inference
+            print(f"No se pudo optimizar el modelo TTS, se usará sin optimizar: {str(e)}")
+    
+    def _audio_valido(self):
+        """
+        Comprueba que el modelo genera audio utilizable con una frase fija.
+        
+        Returns:
+            bool: True si el audio no está vacío, es finito y no es silencio.
+        """
+        try:
+            audio = self.sintetizar(TEXTO_VALIDACION)
+        except Exception:
+            return False
+        
+        if len(audio) == 0 or not np.all(np.isfinite(audio)):
+            return False
+        return float(np.sqrt(np.mean(audio ** 2))) > UMBRAL_RMS_VALIDACION
+    
+    def _contexto_inferencia(self):
+        """Devuelve el contexto de ejecución del modelo (autocast FP16 en GPU)."""
+        if self.usar_cuda:
+            return torch.autocast("cuda", dtype=torch.float16)
+        return contextlib.nullcontext()
+    
+    def calentar(self):
+        """
+        Ejecuta una síntesis corta para que la primera frase real no pague el
+        coste de compilación ni de inicialización del modelo.
+        """
+        for _ in self.sintetizar_stream(["Hola."]):
+            pass
+    
     def sintetizar(self, texto, archivo_salida=None):
         """
         Sintetiza el texto a voz.
@@ -92,68 +190,359 @@ class CoquiSintetizador:
         Args:
             texto (str): Texto a sintetizar.
             archivo_salida (str, opcional): Ruta para guardar el archivo de audio generado.
+                Si no se indica, el audio solo se devuelve en memoria.
             
         Returns:
-            numpy.ndarray: Array con los datos de audio sintetizados o la ruta del archivo guardado.
+            numpy.ndarray: Array float32 con los datos de audio sintetizados.
         """
-        # Crear directorio temporal si no existe y no se especifica otro
-        if archivo_salida is None:
-            os.makedirs('temp', exist_ok=True)
-            archivo_salida = os.path.join('temp', 'audio_temp.wav')
-        
         try:
-            if self.use_new_api:
-                # Usando la API nueva
-                self.tts.tts_to_file(text=texto, file_path=archivo_salida)
-                # Cargar el archivo para devolver los datos de audio si es necesario
-                data, _ = sf.read(archivo_salida)
-                return data
-            else:
-                # API antigua
-                wavs = self.synthesizer.tts(texto)
-                # Guardar audio si se especifica archivo de salida
-                if archivo_salida:
-                    self.synthesizer.save_wav(wavs, archivo_salida)
-                return wavs
+            synthesizer = self.tts.synthesizer if self.use_new_api else self.synthesizer
+            
+            with self._contexto_inferencia():
+                if self.use_new_api:
+                    wav = self.tts.tts(text=texto)
+                else:
+                    wav = self.synthesizer.tts(texto)
+            
+            # Guardar audio solo si se especifica archivo de salida
+            if archivo_salida:
+                synthesizer.save_wav(wav, archivo_salida)
+            
+            return np.asarray(wav, dtype=np.float32)
         except Exception as e:
             print(f"Error durante la síntesis: {str(e)}")
             import traceback
             traceback.print_exc()
             raise
+    
+    @property
+    def frecuencia_muestreo(self):
+        """int: Frecuencia de muestreo (Hz) del audio generado por el modelo."""
+        if self.use_new_api:
+            return self.tts.synthesizer.output_sample_rate
+        return self.synthesizer.output_sample_rate
+    
+    def sintetizar_stream(self, fragmentos):
+        """
+        Sintetiza una secuencia de fragmentos de texto, devolviendo el audio de cada uno.
+        
+        El audio se entrega en memoria (sin pasar por un archivo WAV) para poder
+        reproducir cada frase mientras se sintetiza la siguiente.
+        
+        Args:
+            fragmentos (Iterable[str]): Frases a sintetizar, en orden.
+            
+        Yields:
+            numpy.ndarray: Muestras PCM float32 de cada fragmento.
+        """
+        for texto in fragmentos:
+            if not texto.strip():
+                continue
+            try:
+                audio = self.sintetizar(texto)
+            except Exception as e:
+                print(f"Error durante la síntesis de '{texto}': {str(e)}")
+                continue
+            yield audio
+
+class SalidaAudio:
+    """
+    Salida de audio continua alimentada por un búfer circular de bloques PCM.
+    
+    El stream de sounddevice se abre una sola vez y su callback va sacando
+    muestras del búfer; mientras no hay audio pendiente reproduce silencio.
+    Escribir en el búfer no bloquea, por lo que la reproducción se solapa con la
+    síntesis de las frases siguientes.
+    """
+    
+    def __init__(self, frecuencia):
+        """
+        Abre el stream de salida.
+        
+        Args:
+            frecuencia (int): Frecuencia de muestreo (Hz) del audio a reproducir.
+        """
+        self.frecuencia = frecuencia
+        self._bloques = collections.deque()
+        self._pendiente = np.zeros(0, dtype=np.float32)
+        self._lock = threading.Lock()
+        self._vacio = threading.Event()
+        self._vacio.set()
+        
+        # Usuarios que tienen la salida en uso; una salida retirada (sustituida
+        # por otra de distinta frecuencia) solo se cierra cuando queda libre
+        self._usuarios = 0
+        self._retirada = False
+        
+        self._stream = sd.OutputStream(
+            samplerate=frecuencia,
+            channels=1,
+            dtype='float32',
+            callback=self._callback
+        )
+        self._stream.start()
+    
+    def escribir(self, audio):
+        """
+        Añade audio al búfer de reproducción sin esperar a que suene.
+        
+        Args:
+            audio (numpy.ndarray): Muestras PCM float32 (mono).
+        """
+        audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        if len(audio) == 0:
+            return
+        with self._lock:
+            self._bloques.append(audio)
+            self._vacio.clear()
+    
+    def esperar(self, detener=None):
+        """
+        Espera a que se haya reproducido todo el audio escrito.
+        
+        La espera se limita a la duración del audio pendiente más un margen, para
+        no bloquear indefinidamente si el stream deja de llamar al callback (error
+        del dispositivo o stream cerrado).
+        
+        Args:
+            detener (threading.Event, opcional): Si se activa, se descarta el audio
+                pendiente y se deja de esperar.
+        """
+        if not self._stream.active:
+            return
+        
+        with self._lock:
+            pendientes = len(self._pendiente) + sum(len(b) for b in self._bloques)
+        limite = time.monotonic() + pendientes / self.frecuencia + MARGEN_ESPERA_SALIDA
+        
+        while not self._vacio.wait(0.1):
+            if detener is not None and detener.is_set():
+                self.vaciar()
+                return
+            if time.monotonic() >= limite:
+                print("La salida de audio no respondió; se continúa sin esperar")
+                return
+        
+        # El último bloque ya está en el dispositivo; esperar a que termine de sonar
+        time.sleep(self._stream.latency)
+    
+    def vaciar(self):
+        """Descarta el audio pendiente de reproducir."""
+        with self._lock:
+            self._bloques.clear()
+            self._pendiente = np.zeros(0, dtype=np.float32)
+            self._vacio.set()
+    
+    def adquirir(self):
+        """Registra un usuario de la salida para que no se cierre mientras la usa."""
+        with self._lock:
+            self._usuarios += 1
+    
+    def liberar(self):
+        """Libera la salida; si estaba retirada y nadie más la usa, la cierra."""
+        with self._lock:
+            self._usuarios -= 1
+            cerrar = self._retirada and self._usuarios <= 0
+        
+        # Cerrar fuera del lock: close() espera al callback, que también lo toma
+        if cerrar:
+            self.cerrar()
+    
+    def retirar(self):
+        """Marca la salida como sustituida y la cierra en cuanto quede libre."""
+        with self._lock:
+            self._retirada = True
+            cerrar = self._usuarios <= 0
+        
+        if cerrar:
+            self.cerrar()
+    
+    def cerrar(self):
+        """Cierra el stream de salida."""
+        self._stream.close()
+    
+    def _callback(self, outdata, frames, tiempo, estado):
+        """Copia al búfer de salida el audio pendiente o silencio si no hay."""
+        escritos = 0
+        
+        with self._lock:
+            while escritos < frames:
+                if len(self._pendiente) == 0:
+                    if not self._bloques:
+                        break
+                    self._pendiente = self._bloques.popleft()
+                
+                n = min(frames - escritos, len(self._pendiente))
+                outdata[escritos:escritos + n, 0] = self._pendiente[:n]
+                self._pendiente = self._pendiente[n:]
+                escritos += n
+            
+            if len(self._pendiente) == 0 and not self._bloques:
+                self._vacio.set()
+        
+        outdata[escritos:] = 0
+
+class ReproductorVoz:
+    """
+    Sintetiza y reproduce frases a medida que llegan.
+    
+    Un hilo sintetiza las frases encoladas con `decir` y escribe el audio en la
+    salida compartida, de modo que la primera frase suena mientras se generan (y
+    sintetizan) las siguientes.
+    """
+    
+    def __init__(self, sintetizador=None, detener=None):
+        """
+        Inicializa el reproductor y arranca el hilo de síntesis.
+        
+        Args:
+            sintetizador (CoquiSintetizador, opcional): Sintetizador a utilizar.
+                Por defecto se usa el sintetizador compartido.
+            detener (threading.Event, opcional): Si se activa, se deja de
+                sintetizar y se descarta el audio pendiente.
+        """
+        self.sintetizador = sintetizador or get_sintetizador()
+        self._detener = detener
+        self._salida = get_salida_audio(self.sintetizador.frecuencia_muestreo)
+        self._salida.adquirir()
+        self._frases = queue.Queue()
+        
+        self._hilo = threading.Thread(target=self._sintetizar_frases, daemon=True)
+        self._hilo.start()
+    
+    def decir(self, frase):
+        """
+        Encola una frase para sintetizarla y reproducirla.
+        
+        Args:
+            frase (str): Frase a reproducir.
+        """
+        self._frases.put(frase)
+    
+    def esperar(self):
+        """Indica que no hay más frases y espera a que termine la reproducción."""
+        self._frases.put(None)
+        self._hilo.join()
+        try:
+            self._salida.esperar(self._detener)
+        finally:
+            self._salida.liberar()
+    
+    def _sintetizar_frases(self):
+        """Sintetiza las frases encoladas hasta recibir el marcador de fin (None)."""
+        for audio in self.sintetizador.sintetizar_stream(iter(self._frases.get, None)):
+            if self._detener is not None and self._detener.is_set():
+                break
+            self._salida.escribir(audio)
+
+def get_salida_audio(frecuencia):
+    """
+    Devuelve la salida de audio compartida para la frecuencia indicada.
+    
+    Si cambia la frecuencia, la salida anterior se retira pero no se cierra
+    mientras algún reproductor la siga usando (ver `SalidaAudio.adquirir`).
+    
+    Args:
+        frecuencia (int): Frecuencia de muestreo (Hz) del audio a reproducir.
+        
+    Returns:
+        SalidaAudio: Salida abierta a esa frecuencia.
+    """
+    global _SALIDA
+    
+    with _SALIDA_LOCK:
+        if _SALIDA is None or _SALIDA.frecuencia != frecuencia:
+            if _SALIDA is not None:
+                _SALIDA.retirar()
+            _SALIDA = SalidaAudio(frecuencia)
+    
+    return _SALIDA
+
+def _cerrar_salida_audio():
+    """Cierra la salida de audio compartida al terminar el programa."""
+    if _SALIDA is not None:
+        _SALIDA.cerrar()
+
+# Abrir el dispositivo de audio al importar el módulo para que la primera
+# pregunta no pague el coste de inicializarlo
+try:
+    get_salida_audio(FRECUENCIA_SALIDA)
+except Exception as e:
+    print(f"No se pudo abrir la salida de audio: {str(e)}")
+atexit.register(_cerrar_salida_audio)
+
+def get_sintetizador():
+    """
+    Devuelve el sintetizador compartido, creándolo en el primer uso.
+    
+    Returns:
+        CoquiSintetizador: Instancia con el modelo ya cargado.
+    """
+    global _SINTETIZADOR
+    
+    if _SINTETIZADOR is None:
+        with _SINTETIZADOR_LOCK:
+            if _SINTETIZADOR is None:
+                print("Inicializando sintetizador...")
+                sintetizador = CoquiSintetizador()
+                sintetizador.calentar()
+                _SINTETIZADOR = sintetizador
+    
+    return _SINTETIZADOR
+
+def crear_reproductor(detener=None):
+    """
+    Crea un reproductor de voz en streaming.
+    
+    Args:
+        detener (threading.Event, opcional): Señal para interrumpir la reproducción.
+        
+    Returns:
+        ReproductorVoz: El reproductor, o None si no se pudo inicializar.
+    """
+    try:
+        return ReproductorVoz(detener=detener)
+    except Exception as e:
+        print(f"Error al inicializar el reproductor de voz: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return None
 
-def texto_a_voz(texto, reproducir=True):
+def texto_a_voz(texto, reproducir=True, detener=None):
     """
     Convierte texto a voz y opcionalmente lo reproduce.
     
     Args:
         texto (str): Texto a sintetizar.
         reproducir (bool): Si es True, reproduce el audio.
+        detener (threading.Event, opcional): Señal para interrumpir la reproducción.
         
     Returns:
         str: Ruta al archivo de audio generado.
     """
     try:
-        # Crear directorio temporal si no existe
-        os.makedirs('temp', exist_ok=True)
         archivo_salida = os.path.join('temp', 'audio_salida.wav')
         
-        # Inicializar sintetizador
-        print("Inicializando sintetizador...")
-        sintetizador = CoquiSintetizador()
+        # Obtener el sintetizador (el modelo solo se carga la primera vez)
+        sintetizador = get_sintetizador()
         
         # Sintetizar texto
         print(f"Sintetizando texto: '{texto}'")
-        sintetizador.sintetizar(texto, archivo_salida)
+        data = sintetizador.sintetizar(texto, archivo_salida)
         
         print(f"Audio guardado en: {archivo_salida}")
         
-        # Reproducir el audio si se solicita
+        # Reproducir el audio si se solicita (sin volver a leer el archivo)
         if reproducir:
             print("Reproduciendo audio...")
             try:
-                data, fs = sf.read(archivo_salida)
-                sd.play(data, fs)
-                sd.wait()
+                salida = get_salida_audio(sintetizador.frecuencia_muestreo)
+                salida.adquirir()
+                try:
+                    salida.escribir(data)
+                    salida.esperar(detener)
+                finally:
+                    salida.liberar()
             except Exception as e:
                 print(f"Error al reproducir audio: {str(e)}")
         
@@ -3,7 +3,7 @@
 
 """
 Módulo para el registro y almacenamiento de la conversación de la entrevista.
-Guarda la conversación en un archivo JSON.
+Guarda la conversación en un archivo JSONL (un mensaje por línea).
 """
 
 import os
@@ -11,6 +11,12 @@ import json
 import datetime
 from typing import List, Dict, Any
 
+# Al ejecutar este archivo directamente (prueba del módulo) no existe el paquete modules
+try:
+    from modules.serializacion import serializar
+except ImportError:
+    from serializacion import serializar
+
 class EntrevistaLogger:
     """Clase para gestionar el registro de la conversación de la entrevista."""
     
@@ -27,11 +33,55 @@ class EntrevistaLogger:
         # Generar nombre de archivo único basado en la fecha y hora
         ahora = datetime.datetime.now()
         timestamp = ahora.strftime("%Y%m%d_%H%M%S")
-        self.archivo_salida = os.path.join(directorio, f"entrevista_{timestamp}.json")
+        self.archivo_salida = os.path.join(directorio, f"entrevista_{timestamp}.jsonl")
+        
+        # Archivo creado en exclusiva y sin buffer: cada mensaje (una línea
+        # completa) queda escrito en disco en cuanto se añade. Si otro logger
+        # creó uno en el mismo segundo, se añade un sufijo en vez de mezclarlos
+        sufijo = 0
+        while True:
+            try:
+                self._fh = open(self.archivo_salida, 'xb', buffering=0)
+                break
+            except FileExistsError:
+                sufijo += 1
+                self.archivo_salida = os.path.join(directorio, f"entrevista_{timestamp}_{sufijo}.jsonl")
+        self._mensajes_escritos = 0
+        
+        # Último listado de entrevistas junto con la fecha de modificación del directorio
+        self._listado_cache = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cerrar()
+    
+    def __del__(self):
+        self.cerrar()
+    
+    def cerrar(self) -> None:
+        """Cierra el archivo de transcripción."""
+        fh = getattr(self, "_fh", None)
+        if fh is not None and not fh.closed:
+            fh.close()
+    
+    def agregar_mensaje(self, mensaje: Dict[str, str]) -> None:
+        """
+        Añade un mensaje al final del archivo de transcripción.
+        
+        Args:
+            mensaje (Dict[str, str]): Mensaje con las claves "rol" y "texto".
+        """
+        self._fh.write(serializar(mensaje) + b'\n')
+        self._mensajes_escritos += 1
     
     def guardar_conversacion(self, conversacion: List[Dict[str, str]]) -> str:
         """
-        Guarda la conversación en un archivo JSON.
+        Guarda la conversación en el archivo JSONL.
+        
+        Solo se escriben los mensajes que aún no se habían guardado, por lo que
+        cada turno añade unas pocas líneas en lugar de reescribir el archivo.
         
         Args:
             conversacion (List[Dict[str, str]]): Lista de mensajes de la conversación.
@@ -39,15 +89,8 @@ class EntrevistaLogger:
         Returns:
             str: Ruta al archivo de conversación guardado.
         """
-        # Crear estructura de datos para guardar
-        datos = {
-            "timestamp": datetime.datetime.now().isoformat(),
-            "conversacion": conversacion
-        }
-        
-        # Guardar en archivo JSON
-        with open(self.archivo_salida, 'w', encoding='utf-8') as f:
-            json.dump(datos, f, ensure_ascii=False, indent=2)
+        for mensaje in conversacion[self._mensajes_escritos:]:
+            self.agregar_mensaje(mensaje)
         
         return self.archivo_salida
     
@@ -67,8 +110,11 @@ class EntrevistaLogger:
         
         try:
             with open(archivo, 'r', encoding='utf-8') as f:
-                datos = json.load(f)
-                return datos.get("conversacion", [])
+                # Formato anterior: un único objeto JSON con la conversación completa
+                if archivo.endswith(".json"):
+                    datos = json.load(f)
+                    return datos.get("conversacion", [])
+                return [json.loads(linea) for linea in f if linea.strip()]
         except (FileNotFoundError, json.JSONDecodeError) as e:
             print(f"Error al cargar la conversación: {str(e)}")
             return []
@@ -77,13 +123,28 @@ class EntrevistaLogger:
         """
         Lista todos los archivos de entrevista disponibles.
         
+        El resultado se reutiliza mientras el directorio no cambie (misma fecha de
+        modificación).
+        
         Returns:
             List[str]: Lista de nombres de archivo de entrevistas.
         """
         try:
-            archivos = [f for f in os.listdir(self.directorio) 
-                       if f.startswith("entrevista_") and f.endswith(".json")]
-            return sorted(archivos)
+            mtime = os.stat(self.directorio).st_mtime_ns
+            if self._listado_cache is not None and self._listado_cache[0] == mtime:
+                return list(self._listado_cache[1])
+            
+            # El nombre incluye YYYYMMDD_HHMMSS, así que el orden lexicográfico es cronológico
+            with os.scandir(self.directorio) as entradas:
+                archivos = sorted(
+                    e.name for e in entradas
+                    if e.name.startswith("entrevista_")
+                    and e.name.endswith((".json", ".jsonl"))
+                    and e.is_file()
+                )
+            
+            self._listado_cache = (mtime, archivos)
+            return list(archivos)
         except Exception as e:
             print(f"Error al listar entrevistas: {str(e)}")
             return []
@@ -104,16 +165,18 @@ class EntrevistaLogger:
         if not conversacion:
             return {"error": "No se encontró conversación para resumir"}
         
-        # Contar turnos
-        turnos_entrevistador = sum(1 for m in conversacion if m["rol"] == "entrevistador")
-        turnos_candidato = sum(1 for m in conversacion if m["rol"] == "candidato")
-        
-        # Contar caracteres/palabras
-        texto_entrevistador = " ".join(m["texto"] for m in conversacion if m["rol"] == "entrevistador")
-        texto_candidato = " ".join(m["texto"] for m in conversacion if m["rol"] == "candidato")
+        # Contar turnos y palabras en una sola pasada, sin concatenar los textos
+        turnos_entrevistador = turnos_candidato = 0
+        palabras_entrevistador = palabras_candidato = 0
         
-        palabras_entrevistador = len(texto_entrevistador.split())
-        palabras_candidato = len(texto_candidato.split())
+        for m in conversacion:
+            rol = m["rol"]
+            if rol == "entrevistador":
+                turnos_entrevistador += 1
+                palabras_entrevistador += len(m["texto"].split())
+            elif rol == "candidato":
+                turnos_candidato += 1
+                palabras_candidato += len(m["texto"].split())
         
         # Generar resumen
         resumen = {
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Módulo de cachés para las preguntas generadas por el LLM.
+Incluye una caché exacta en memoria para peticiones idénticas y una caché
+semántica que reutiliza una pregunta ya generada cuando el candidato responde
+de forma prácticamente igual en el mismo punto de la entrevista.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+class CacheExacta:
+    """Clase para cachear en memoria las preguntas de peticiones idénticas (LRU con caducidad)."""
+    
+    def __init__(self, max_entradas=1024, ttl=3600):
+        """
+        Inicializa la caché exacta.
+        
+        Args:
+            max_entradas (int): Número máximo de preguntas guardadas; se descartan
+                primero las usadas hace más tiempo.
+            ttl (float): Segundos que una pregunta sigue siendo válida.
+        """
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def clave(modelo: str, prompt_base: str, conversacion: List[Dict[str, str]]) -> str:
+        """
+        Calcula la clave de una petición.
+        
+        Args:
+            modelo (str): ID del modelo.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            conversacion (List[Dict[str, str]]): Conversación enviada al modelo.
+        
+        Returns:
+            str: Hash hexadecimal de la petición.
+        """
+        datos = json.dumps({"m": modelo, "p": prompt_base, "c": conversacion}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(datos.encode('utf-8')).hexdigest()
+    
+    def obtener(self, clave: str) -> Optional[str]:
+        """
+        Devuelve la pregunta cacheada para la clave, o None si no existe o ha caducado.
+        
+        Args:
+            clave (str): Clave de la petición (ver `clave`).
+        
+        Returns:
+            Optional[str]: La pregunta cacheada.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            
+            instante, pregunta = entrada
+            if time.monotonic() - instante > self.ttl:
+                del self._entradas[clave]
+                return None
+            
+            self._entradas.move_to_end(clave)
+            return pregunta
+    
+    def agregar(self, clave: str, pregunta: str) -> None:
+        """
+        Añade una pregunta a la caché.
+        
+        Args:
+            clave (str): Clave de la petición (ver `clave`).
+            pregunta (str): Pregunta generada por el LLM.
+        """
+        with self._lock:
+            self._entradas[clave] = (time.monotonic(), pregunta)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+class CacheSemantica:
+    """Clase para cachear preguntas del LLM según la similitud de la respuesta del candidato."""
+    
+    def __init__(self, directorio="cache", modelo="sentence-transformers/all-MiniLM-L6-v2", umbral=0.92,
+                 ventana_contexto=4, peso_respuesta=0.7):
+        """
+        Inicializa la caché, cargando la guardada en disco si existe.
+        
+        Args:
+            directorio (str): Directorio donde se persiste la caché entre sesiones.
+            modelo (str): Modelo de sentence-transformers para calcular los embeddings.
+            umbral (float): Similitud coseno mínima para reutilizar una pregunta.
+                Debe ser alto para no servir preguntas de respuestas solo parecidas.
+            ventana_contexto (int): Número de turnos anteriores a la respuesta que
+                se mezclan en el embedding de consulta.
+            peso_respuesta (float): Peso de la respuesta frente a esos turnos
+                anteriores (1.0 = solo la respuesta).
+        """
+        # sentence-transformers y FAISS son opcionales y tardan en importarse, así
+        # que solo se cargan si se usa la caché semántica
+        try:
+            import faiss
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("La caché semántica requiere sentence-transformers y faiss-cpu")
+        self._faiss = faiss
+        
+        self.directorio = directorio
+        self.umbral = umbral
+        self.ventana_contexto = ventana_contexto
+        self.peso_respuesta = peso_respuesta
+        self.archivo_indice = os.path.join(directorio, "preguntas.faiss")
+        self.archivo_entradas = os.path.join(directorio, "preguntas.json")
+        os.makedirs(directorio, exist_ok=True)
+        
+        self._lock = threading.Lock()
+        self._encoder = SentenceTransformer(modelo)
+        dimension = self._encoder.get_sentence_embedding_dimension()
+        
+        # Cada entrada del índice corresponde a la entrada de la misma posición
+        # en self._entradas: {"contexto": hash, "pregunta": texto}
+        if os.path.exists(self.archivo_indice) and os.path.exists(self.archivo_entradas):
+            self._indice = self._faiss.read_index(self.archivo_indice)
+            with open(self.archivo_entradas, 'r', encoding='utf-8') as f:
+                self._entradas = json.load(f)
+        else:
+            self._indice = self._faiss.IndexFlatIP(dimension)
+            self._entradas = []
+    
+    @staticmethod
+    def hash_contexto(conversacion: List[Dict[str, str]], prompt_base: str) -> Optional[str]:
+        """
+        Calcula el hash del contexto en el que se responde.
+        
+        El contexto es el prompt base más la última pregunta del entrevistador, de
+        modo que una respuesta solo reutiliza preguntas dadas a la misma pregunta.
+        
+        La respuesta a la pregunta inicial no tiene contexto cacheable: esa pregunta
+        es la misma para todos los candidatos y la caché se guarda entre sesiones,
+        así que se podría servir a un candidato una pregunta generada para la
+        presentación de otro (con su nombre, empresa o proyectos).
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Conversación, terminada en la respuesta del candidato.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+        
+        Returns:
+            Optional[str]: Hash hexadecimal del contexto, o None si no se debe cachear.
+        """
+        preguntas = [m["texto"] for m in conversacion if m["rol"] == "entrevistador"]
+        if len(preguntas) < 2:
+            return None
+        pregunta_anterior = preguntas[-1]
+        
+        return hashlib.sha256(f"{prompt_base}\x00{pregunta_anterior}".encode('utf-8')).hexdigest()
+    
+    def consultar(self, respuesta: str, contexto: Optional[str], k: int = 8,
+                  historial: Optional[List[Dict[str, str]]] = None) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Busca una pregunta cacheada para una respuesta similar en el mismo contexto.
+        
+        Args:
+            respuesta (str): Respuesta del candidato.
+            contexto (Optional[str]): Hash del contexto (ver `hash_contexto`); si es
+                None no se consulta la caché.
+            k (int): Número de vecinos más cercanos a revisar.
+            historial (List[Dict[str, str]], opcional): Conversación anterior a la
+                respuesta. Sus últimos turnos (sin la pregunta que se responde)
+                sesgan la búsqueda hacia entrevistas que venían hablando de lo mismo.
+        
+        Returns:
+            Tuple[Optional[str], Optional[np.ndarray]]: La pregunta cacheada (o None)
+                y el embedding de la consulta, para reutilizarlo en `agregar`.
+        """
+        if contexto is None:
+            return None, None
+        
+        turnos = []
+        if historial and self.ventana_contexto > 0:
+            # La pregunta que se responde ya forma parte del contexto (ver `hash_contexto`)
+            # y es idéntica en todos los aciertos: mezclarla solo inflaría la similitud
+            for i in range(len(historial) - 1, -1, -1):
+                if historial[i]["rol"] == "entrevistador":
+                    historial = historial[:i] + historial[i + 1:]
+                    break
+            turnos = [m["texto"] for m in historial[-self.ventana_contexto:]]
+        embedding = self._embedding(respuesta, turnos)
+        
+        with self._lock:
+            if self._indice.ntotal == 0:
+                return None, embedding
+            
+            similitudes, indices = self._indice.search(embedding, min(k, self._indice.ntotal))
+        
+        for similitud, indice in zip(similitudes[0], indices[0]):
+            if similitud < self.umbral:
+                break
+            entrada = self._entradas[indice]
+            if entrada["contexto"] == contexto:
+                return entrada["pregunta"], embedding
+        
+        return None, embedding
+    
+    def agregar(self, embedding: Optional[np.ndarray], contexto: Optional[str], pregunta: str) -> None:
+        """
+        Añade una pregunta generada a la caché.
+        
+        Args:
+            embedding (Optional[np.ndarray]): Embedding de la respuesta devuelto por `consultar`.
+            contexto (Optional[str]): Hash del contexto (ver `hash_contexto`); si es
+                None la pregunta no se guarda.
+            pregunta (str): Pregunta generada por el LLM.
+        """
+        if contexto is None or embedding is None:
+            return
+        
+        with self._lock:
+            self._indice.add(embedding)
+            self._entradas.append({"contexto": contexto, "pregunta": pregunta})
+    
+    def guardar(self) -> None:
+        """Guarda la caché en disco para las siguientes sesiones."""
+        with self._lock:
+            self._faiss.write_index(self._indice, self.archivo_indice)
+            with open(self.archivo_entradas, 'w', encoding='utf-8') as f:
+                json.dump(self._entradas, f, ensure_ascii=False)
+    
+    def _embedding(self, texto: str, turnos: List[str] = ()) -> np.ndarray:
+        """
+        Calcula el embedding normalizado (producto interno = coseno) del texto.
+        
+        Si se indican turnos anteriores, el resultado es la media ponderada entre
+        el texto (peso_respuesta) y la media de esos turnos, normalizada de nuevo.
+        """
+        normalizados = [" ".join(t.lower().split()) for t in (texto, *turnos)]
+        embeddings = np.asarray(self._encoder.encode(normalizados, normalize_embeddings=True), dtype=np.float32)
+        
+        if len(embeddings) == 1:
+            return embeddings
+        
+        embedding = self.peso_respuesta * embeddings[0] + (1.0 - self.peso_respuesta) * embeddings[1:].mean(axis=0)
+        embedding /= np.linalg.norm(embedding) or 1.0
+        return embedding[np.newaxis, :]
+
+def crear_cache_semantica() -> Optional[CacheSemantica]:
+    """
+    Crea la caché semántica.
+    
+    Returns:
+        Optional[CacheSemantica]: La caché, o None si no se pudo inicializar.
+    """
+    try:
+        return CacheSemantica()
+    except Exception as e:
+        print(f"No se pudo inicializar la caché semántica: {str(e)}")
+        return None
+
+if __name__ == "__main__":
+    # Prueba del módulo
+    print("Probando módulo de caché semántica...")
+    
+    cache = crear_cache_semantica()
+    if cache is not None:
+        conversacion_ejemplo = [
+            {"rol": "entrevistador", "texto": "Hola, ¿podrías presentarte brevemente?"},
+            {"rol": "candidato", "texto": "Soy desarrollador backend."},
+            {"rol": "entrevistador", "texto": "¿Has trabajado antes con Python?"},
+            {"rol": "candidato", "texto": "Sí, claro."},
+        ]
+        contexto = CacheSemantica.hash_contexto(conversacion_ejemplo, "Prompt de prueba")
+        
+        pregunta, embedding = cache.consultar("Sí, claro.", contexto)
+        print(f"Primera consulta: {pregunta}")
+        cache.agregar(embedding, contexto, "¿En qué proyectos lo has usado?")
+        
+        pregunta, _ = cache.consultar("sí claro", contexto)
+        print(f"Segunda consulta: {pregunta}")
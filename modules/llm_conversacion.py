@@ -7,12 +7,223 @@ para generar preguntas durante entrevistas basándose en la conversación previa
 """
 
 import os
+import re
+import time
+import queue
+import random
+import itertools
+import importlib.util
+import asyncio
+import threading
 import requests
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Iterator, Optional, Tuple
+
+# Al ejecutar este archivo directamente (prueba del módulo) no existe el paquete modules
+try:
+    from modules.llm_cache import CacheExacta
+    from modules.serializacion import serializar, deserializar
+except ImportError:
+    from llm_cache import CacheExacta
+    from serializacion import serializar, deserializar
+
+# httpx es opcional: solo lo necesita la versión asíncrona (agenerar_pregunta)
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# HTTP/2 en httpx requiere el paquete h2 (pip install "httpx[http2]"); permite
+# multiplexar todas las peticiones concurrentes sobre una sola conexión
+HTTP2_DISPONIBLE = importlib.util.find_spec("h2") is not None
 
 # Cargar clave API desde variables de entorno
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
+# Varias claves separadas por comas (opcional): las peticiones se reparten entre
+# ellas para no agotar el límite de una sola
+OPENROUTER_API_KEYS = [
+    clave.strip() for clave in os.getenv("OPENROUTER_API_KEYS", "").split(",") if clave.strip()
+] or ([OPENROUTER_API_KEY] if OPENROUTER_API_KEY else [])
+
+# Segundos que se deja descansar una clave tras un 429 sin cabecera Retry-After
+ESPERA_LIMITE_CLAVE = 30.0
+
+# Tiempo máximo (segundos) para conectar y para esperar datos de OpenRouter
+TIMEOUT_PETICION = (10.0, 60.0)
+
+# Reintentos ante errores transitorios (límite de peticiones o fallo del servidor)
+INTENTOS_MAX = 4
+ESPERA_MAX_REINTENTO = 8.0
+_ESTADOS_REINTENTABLES = frozenset({429, 500, 502, 503, 504})
+
+# Mapeo de nombres cortos a IDs completos en OpenRouter
+_ALIAS_MODELOS = {
+    "meta-llama": "meta-llama/llama-3.3-8b-instruct:free",
+    "claude": "anthropic/claude-3.5-haiku",
+    "gpt": "openai/gpt-3.5-turbo",
+    "gpt4": "openai/gpt-4",
+    "mistral": "mistralai/mistral-7b-instruct",
+    "gemini": "google/gemini-pro",
+}
+
+# Cabeceras comunes a todas las peticiones (la de Authorization va aparte, por clave)
+_CABECERAS_OPENROUTER = {
+    "Content-Type": "application/json",
+    "HTTP-Referer": "https://entrevistador-app.com",  # Cambiado a un dominio más específico
+    "X-Title": "Entrevistador-LLM"       # Identificador de tu aplicación
+}
+
+# Prefijo que algunos modelos anteponen a la pregunta y que se descarta
+PREFIJO_ENTREVISTADOR = "Entrevistador:"
+
+# Preguntas de respaldo cuando el modelo no devuelve una pregunta válida
+PREGUNTA_RESPALDO_FORMATO = "¿Podrías contarme más sobre tus habilidades técnicas?"
+PREGUNTA_RESPALDO_API = "¿Cómo relacionarías tu experiencia previa con este puesto específicamente?"
+PREGUNTA_RESPALDO_ERROR = "Interesante. ¿Puedes contarme más sobre tu experiencia en ese aspecto?"
+PREGUNTAS_RESPALDO = (PREGUNTA_RESPALDO_FORMATO, PREGUNTA_RESPALDO_API, PREGUNTA_RESPALDO_ERROR)
+
+# Conversaciones ya creadas por modelo, reutilizadas entre turnos
+_CONVERSACIONES: Dict[str, "OpenRouterConversacion"] = {}
+
+# Rol en la API de cada rol de la conversación (cualquier otro se envía como "user")
+_ROL_API = {"entrevistador": "assistant", "candidato": "user"}
+
+# Instrucción final que se añade tras el historial en cada petición
+INSTRUCCION_SIGUIENTE_PREGUNTA = "Genera la siguiente pregunta del entrevistador basada en la conversación anterior. Solo devuelve la pregunta sin explicaciones adicionales o prefijos."
+
+# Instrucción para pedir varias preguntas alternativas en una sola petición
+INSTRUCCION_PREGUNTAS_MULTIPLES = "Genera {n} posibles próximas preguntas del entrevistador basadas en la conversación anterior, numeradas 1) a {n}), una por línea. Solo devuelve las preguntas sin explicaciones adicionales o prefijos."
+
+# Tamaño aproximado (en tokens) a partir del cual se resumen los turnos más antiguos
+MAX_TOKENS_HISTORIAL = 4000
+
+# Instrucción para resumir los turnos antiguos y prefijo con el que se envía el resumen
+INSTRUCCION_RESUMEN = "Resume de forma breve y objetiva esta parte de una entrevista de trabajo, conservando los datos relevantes del candidato (experiencia, tecnologías, respuestas destacadas). Solo devuelve el resumen."
+PREFIJO_RESUMEN = "Resumen de la conversación previa: "
+
+# Línea numerada "1) pregunta" en la respuesta de preguntas múltiples
+_PREGUNTA_NUMERADA_RE = re.compile(r'^\s*\d+\)\s*(.+)$', re.MULTILINE)
+
+def _contenido_sistema_generico(prompt_sistema: str) -> Any:
+    """Contenido del mensaje de sistema para proveedores con caché de prefijos automática."""
+    return prompt_sistema
+
+def _contenido_sistema_anthropic(prompt_sistema: str) -> Any:
+    """Contenido del mensaje de sistema marcado con cache_control (Anthropic lo requiere explícito)."""
+    return [{
+        "type": "text",
+        "text": prompt_sistema,
+        "cache_control": {"type": "ephemeral"}
+    }]
+
+# Adaptadores del mensaje de sistema por prefijo del ID del modelo
+_ADAPTADORES_SISTEMA = {
+    "anthropic/": _contenido_sistema_anthropic,
+}
+
+class RotadorClaves:
+    """Clase para repartir las peticiones entre varias claves API por turnos (round-robin)."""
+    
+    def __init__(self, claves: List[str]):
+        """
+        Inicializa el rotador.
+        
+        Args:
+            claves (List[str]): Claves API de OpenRouter.
+        """
+        self.claves = list(claves)
+        self._ciclo = itertools.cycle(self.claves)
+        self._disponible_desde: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def siguiente(self) -> str:
+        """
+        Devuelve la siguiente clave que no esté en espera por un límite de peticiones.
+        
+        Returns:
+            str: Clave API. Si todas están en espera, la que antes quede libre.
+        """
+        with self._lock:
+            ahora = time.monotonic()
+            for _ in range(len(self.claves)):
+                clave = next(self._ciclo)
+                if self._disponible_desde.get(clave, 0.0) <= ahora:
+                    return clave
+            return min(self.claves, key=lambda c: self._disponible_desde.get(c, 0.0))
+    
+    def penalizar(self, clave: str, segundos: float = ESPERA_LIMITE_CLAVE) -> None:
+        """
+        Deja una clave en espera tras recibir un 429.
+        
+        Args:
+            clave (str): Clave API que alcanzó su límite.
+            segundos (float): Tiempo durante el que no se usará.
+        """
+        with self._lock:
+            self._disponible_desde[clave] = time.monotonic() + segundos
+
+# Rotador compartido por todas las conversaciones (los límites son por clave, no por modelo)
+_ROTADOR_CLAVES = RotadorClaves(OPENROUTER_API_KEYS)
+
+class GestorPrompt:
+    """
+    Clase para construir los mensajes con un prefijo estable entre turnos.
+    
+    Los proveedores cachean el prefijo más largo que coincide byte a byte con una
+    petición anterior, así que los mensajes siempre siguen el orden
+    [sistema] + historial + [instrucción final]: el prompt de sistema se prepara
+    una sola vez y el historial solo crece por el final.
+    """
+    
+    def __init__(self, prompt_base: str, modelo: str):
+        """
+        Inicializa el gestor de prompt.
+        
+        Args:
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            modelo (str): ID del modelo en OpenRouter, para elegir el adaptador de caché.
+        """
+        self.prompt_sistema = prompt_base.strip()
+        
+        adaptador = _contenido_sistema_generico
+        for prefijo, adaptador_modelo in _ADAPTADORES_SISTEMA.items():
+            if modelo.startswith(prefijo):
+                adaptador = adaptador_modelo
+                break
+        
+        self._mensaje_sistema = {"role": "system", "content": adaptador(self.prompt_sistema)}
+        self._mensaje_instruccion = {"role": "user", "content": INSTRUCCION_SIGUIENTE_PREGUNTA}
+    
+    def construir_mensajes(self, conversacion: List[Dict[str, str]], instruccion: Optional[str] = None,
+                           resumen: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Construye los mensajes para la conversación dada.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            instruccion (str, opcional): Instrucción final distinta de la habitual
+                (pedir la siguiente pregunta).
+            resumen (str, opcional): Resumen de los turnos anteriores a `conversacion`.
+            
+        Returns:
+            List[Dict[str, Any]]: Mensajes listos para enviar a la API.
+        """
+        # Lista reservada de antemano: sistema, resumen opcional, historial e instrucción
+        desplazamiento = 2 if resumen else 1
+        mensajes = [None] * (len(conversacion) + desplazamiento + 1)
+        mensajes[0] = self._mensaje_sistema
+        if resumen:
+            mensajes[1] = {"role": "system", "content": PREFIJO_RESUMEN + resumen}
+        
+        for i, mensaje in enumerate(conversacion, desplazamiento):
+            mensajes[i] = {"role": _ROL_API.get(mensaje["rol"], "user"), "content": mensaje["texto"]}
+        
+        if instruccion is None:
+            mensajes[-1] = self._mensaje_instruccion
+        else:
+            mensajes[-1] = {"role": "user", "content": instruccion}
+        return mensajes
+
 class OpenRouterConversacion:
     """Clase para manejar la interacción con modelos a través de OpenRouter."""
     
@@ -30,33 +241,294 @@ class OpenRouterConversacion:
                 Para ver una lista actualizada de modelos disponibles:
                 https://openrouter.ai/docs#models
         """
-        if not OPENROUTER_API_KEY:
+        if not _ROTADOR_CLAVES.claves:
             raise ValueError("No se encontró la clave API de OpenRouter en las variables de entorno.")
         
-        # Mapeo de nombres cortos a IDs completos en OpenRouter
-        modelo_mapping = {
-            "meta-llama":"meta-llama/llama-3.3-8b-instruct:free",
-        }
-        
         # Si se proporciona un nombre corto, convertirlo al ID completo
-        if modelo in modelo_mapping:
-            modelo = modelo_mapping[modelo]
+        if modelo in _ALIAS_MODELOS:
+            modelo = _ALIAS_MODELOS[modelo]
             print(f"Usando modelo: {modelo}")
         
-        self.api_key = OPENROUTER_API_KEY
+        # La cabecera Authorization se añade en cada petición con la clave que toque
+        self.api_key = _ROTADOR_CLAVES.claves[0]
         self.modelo = modelo
         self.url = "https://openrouter.ai/api/v1/chat/completions"
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {self.api_key}",
-            "HTTP-Referer": "https://entrevistador-app.com",  # Cambiado a un dominio más específico
-            "X-Title": "Entrevistador-LLM"       # Identificador de tu aplicación
+        self.headers = _CABECERAS_OPENROUTER
+        
+        # Sesión persistente: reutiliza la conexión TCP/TLS con OpenRouter entre turnos
+        self._session = requests.Session()
+        self._session.headers.update(self.headers)
+        
+        # Cliente asíncrono (httpx), creado al primer uso de agenerar_pregunta
+        self._cliente_async = None
+        self._loop_async = None
+        
+        # Gestores de prompt por prompt base (normalmente uno por entrevista)
+        self._gestores: Dict[str, GestorPrompt] = {}
+        
+        # Preguntas ya generadas para peticiones idénticas (reintentos, pruebas)
+        self._cache_respuestas = CacheExacta()
+        
+        # Límite del historial y última compactación: (turnos resumidos, hash de esos turnos, resumen)
+        self.max_tokens_historial = MAX_TOKENS_HISTORIAL
+        self._compactacion: Optional[Tuple[int, str, str]] = None
+    
+    def close(self) -> None:
+        """Cierra la sesión HTTP y sus conexiones abiertas."""
+        session = getattr(self, "_session", None)
+        if session is not None:
+            session.close()
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente HTTP asíncrono, si se llegó a crear."""
+        cliente = self._cliente_async
+        self._cliente_async = None
+        self._loop_async = None
+        if cliente is not None:
+            await cliente.aclose()
+    
+    def __del__(self):
+        self.close()
+    
+    def _construir_mensajes(self, conversacion: List[Dict[str, str]], prompt_base: str,
+                            instruccion: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Construye la lista de mensajes en el formato de OpenRouter/ChatCompletion.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            instruccion (str, opcional): Instrucción final distinta de la habitual.
+            
+        Returns:
+            List[Dict[str, Any]]: Mensajes listos para enviar a la API.
+        """
+        gestor = self._gestores.get(prompt_base)
+        if gestor is None:
+            gestor = GestorPrompt(prompt_base, self.modelo)
+            self._gestores[prompt_base] = gestor
+        
+        resumen, recientes = self._compactar_historial(conversacion)
+        return gestor.construir_mensajes(recientes, instruccion, resumen)
+    
+    def _compactar_historial(self, conversacion: List[Dict[str, str]]) -> Tuple[Optional[str], List[Dict[str, str]]]:
+        """
+        Limita el tamaño del historial resumiendo los turnos más antiguos.
+        
+        Cuando el historial supera `max_tokens_historial` (estimado como 4 caracteres
+        por token), la mitad más antigua de los turnos sin resumir se resume con el
+        LLM junto con el resumen anterior. El resumen se reutiliza en los turnos
+        siguientes mientras la conversación empiece por los mismos turnos, para no
+        cambiar el prefijo de los mensajes en cada petición.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            
+        Returns:
+            Tuple[Optional[str], List[Dict[str, str]]]: El resumen (o None) y los
+                turnos que se envían completos.
+        """
+        resumen, inicio = None, 0
+        if self._compactacion is not None:
+            turnos_resumidos, clave, texto = self._compactacion
+            if (len(conversacion) >= turnos_resumidos
+                    and CacheExacta.clave("", "", conversacion[:turnos_resumidos]) == clave):
+                resumen, inicio = texto, turnos_resumidos
+        
+        recientes = conversacion[inicio:]
+        tokens = (len(resumen or "") + sum(len(m["texto"]) for m in recientes)) // 4
+        if tokens <= self.max_tokens_historial or len(recientes) < 2:
+            return resumen, recientes
+        
+        corte = inicio + len(recientes) // 2
+        nuevo_resumen = self._resumir(resumen, conversacion[inicio:corte])
+        if nuevo_resumen is None:
+            return resumen, recientes
+        
+        self._compactacion = (corte, CacheExacta.clave("", "", conversacion[:corte]), nuevo_resumen)
+        return nuevo_resumen, conversacion[corte:]
+    
+    def _resumir(self, resumen_previo: Optional[str], turnos: List[Dict[str, str]]) -> Optional[str]:
+        """
+        Resume unos turnos de la entrevista con el LLM.
+        
+        Args:
+            resumen_previo (str, opcional): Resumen de los turnos anteriores, que se incluye.
+            turnos (List[Dict[str, str]]): Turnos a resumir.
+            
+        Returns:
+            Optional[str]: El resumen, o None si no se pudo generar.
+        """
+        texto = "\n".join(f"{m['rol'].capitalize()}: {m['texto']}" for m in turnos)
+        if resumen_previo:
+            texto = f"{PREFIJO_RESUMEN}{resumen_previo}\n{texto}"
+        
+        payload = {
+            "model": self.modelo,
+            "messages": [
+                {"role": "system", "content": INSTRUCCION_RESUMEN},
+                {"role": "user", "content": texto}
+            ],
+            "max_tokens": 400,
+            "temperature": 0.3
         }
+        
+        try:
+            response = self._post(payload)
+            if not response.ok:
+                self._reportar_error(response)
+            
+            resumen = deserializar(response.content)["choices"][0]["message"]["content"].strip()
+            return resumen or None
+        
+        except Exception as e:
+            print(f"Error al resumir el historial con OpenRouter: {str(e)}")
+            return None
+    
+    def _cabeceras_auth(self) -> Dict[str, str]:
+        """Cabecera Authorization con la siguiente clave API disponible."""
+        return {"Authorization": f"Bearer {_ROTADOR_CLAVES.siguiente()}"}
+    
+    def _reportar_error(self, response: requests.Response) -> None:
+        """
+        Muestra el mensaje de error detallado de la API y lanza la excepción HTTP.
+        
+        Args:
+            response (requests.Response | httpx.Response): Respuesta fallida de OpenRouter.
+        """
+        error_detail = "Detalles no disponibles"
+        try:
+            error_json = response.json()
+            if "error" in error_json:
+                if isinstance(error_json["error"], dict) and "message" in error_json["error"]:
+                    error_detail = error_json["error"]["message"]
+                elif isinstance(error_json["error"], str):
+                    error_detail = error_json["error"]
+        except:
+            pass
+        
+        print(f"Error en la API de OpenRouter ({response.status_code}): {error_detail}")
+        print(f"Modelo solicitado: {self.modelo}")
+        response.raise_for_status()
+    
+    def _espera_reintento(self, response: Any, intento: int) -> float:
+        """
+        Calcula cuánto esperar antes de reintentar una petición fallida.
+        
+        Si la respuesta es un 429, además deja en espera la clave que lo recibió.
+        
+        Args:
+            response (requests.Response | httpx.Response | None): Respuesta fallida,
+                o None si falló la conexión.
+            intento (int): Número de intento que acaba de fallar (desde 0).
+            
+        Returns:
+            float: Segundos de espera (backoff exponencial con algo de azar).
+        """
+        espera = min(2 ** intento, ESPERA_MAX_REINTENTO) + random.random()
+        
+        if response is not None and response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get("Retry-After", ESPERA_LIMITE_CLAVE))
+            except ValueError:
+                retry_after = ESPERA_LIMITE_CLAVE
+            clave = response.request.headers.get("Authorization", "").removeprefix("Bearer ")
+            _ROTADOR_CLAVES.penalizar(clave, retry_after)
+            
+            # Con una sola clave no sirve de nada reintentar antes de lo que pide la API
+            if len(_ROTADOR_CLAVES.claves) == 1:
+                espera = max(espera, min(retry_after, ESPERA_MAX_REINTENTO))
+        
+        return espera
+    
+    def _post(self, payload: Dict[str, Any], stream: bool = False,
+              cancelado: Optional[threading.Event] = None) -> Optional[requests.Response]:
+        """
+        Envía la petición a OpenRouter, reintentando los errores transitorios.
+        
+        Cada intento usa la siguiente clave API disponible. Tras el último intento
+        se devuelve la respuesta tal cual (o se propaga el error de conexión).
+        
+        Args:
+            payload (Dict[str, Any]): Cuerpo de la petición.
+            stream (bool): Si es True, la respuesta se lee en streaming.
+            cancelado (threading.Event, opcional): Si se activa, se abandonan los
+                reintentos pendientes.
+            
+        Returns:
+            Optional[requests.Response]: Respuesta de OpenRouter, o None si se canceló.
+        """
+        def esperar(segundos: float) -> bool:
+            """Espera antes de reintentar; devuelve True si se canceló mientras tanto."""
+            if cancelado is None:
+                time.sleep(segundos)
+                return False
+            return cancelado.wait(segundos)
+        
+        datos = serializar(payload)
+        for intento in range(INTENTOS_MAX):
+            if cancelado is not None and cancelado.is_set():
+                return None
+            
+            ultimo = intento == INTENTOS_MAX - 1
+            try:
+                response = self._session.post(self.url, data=datos, headers=self._cabeceras_auth(),
+                                              stream=stream, timeout=TIMEOUT_PETICION)
+            except (requests.ConnectionError, requests.Timeout):
+                if ultimo:
+                    raise
+                if esperar(self._espera_reintento(None, intento)):
+                    return None
+                continue
+            
+            if response.status_code not in _ESTADOS_REINTENTABLES:
+                return response
+            
+            espera = self._espera_reintento(response, intento)
+            if ultimo:
+                return response
+            response.close()
+            if esperar(espera):
+                return None
+    
+    async def _apost(self, payload: Dict[str, Any]) -> "httpx.Response":
+        """
+        Versión asíncrona de `_post` con el cliente httpx.
+        
+        Args:
+            payload (Dict[str, Any]): Cuerpo de la petición.
+            
+        Returns:
+            httpx.Response: Respuesta de OpenRouter.
+        """
+        cliente = self._get_cliente_async()
+        datos = serializar(payload)
+        for intento in range(INTENTOS_MAX):
+            ultimo = intento == INTENTOS_MAX - 1
+            try:
+                response = await cliente.post(self.url, content=datos, headers=self._cabeceras_auth())
+            except httpx.TransportError:
+                if ultimo:
+                    raise
+                await asyncio.sleep(self._espera_reintento(None, intento))
+                continue
+            
+            if response.status_code not in _ESTADOS_REINTENTABLES:
+                return response
+            
+            espera = self._espera_reintento(response, intento)
+            if ultimo:
+                return response
+            await asyncio.sleep(espera)
     
     def generar_pregunta(self, conversacion: List[Dict[str, str]], prompt_base: str) -> str:
         """
         Genera una nueva pregunta usando OpenRouter.
         
+        Es una envoltura sobre `generar_pregunta_stream` que espera a tener la
+        pregunta completa; quien pueda mostrarla a medida que llega debería usar
+        directamente la versión en streaming.
+        
         Args:
             conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
             prompt_base (str): Prompt base con instrucciones para el modelo.
@@ -64,20 +536,74 @@ class OpenRouterConversacion:
         Returns:
             str: La nueva pregunta generada.
         """
-        # Formatear los mensajes en el formato de OpenRouter/ChatCompletion
-        mensajes = [{"role": "system", "content": prompt_base}]
+        return "".join(self.generar_pregunta_stream(conversacion, prompt_base)).strip()
+    
+    def generar_preguntas_multiples(self, conversacion: List[Dict[str, str]], prompt_base: str, n: int = 3) -> List[str]:
+        """
+        Genera varias preguntas alternativas en una sola petición.
         
-        for mensaje in conversacion:
-            rol = mensaje["rol"]
-            texto = mensaje["texto"]
-            rol_api = "assistant" if rol == "entrevistador" else "user"
-            mensajes.append({"role": rol_api, "content": texto})
+        Sale más barato que hacer n peticiones: el contexto se envía una vez y
+        solo se paga un viaje de ida y vuelta.
         
-        mensajes.append({
-            "role": "user", 
-            "content": "Genera la siguiente pregunta del entrevistador basada en la conversación anterior. Solo devuelve la pregunta sin explicaciones adicionales o prefijos."
-        })
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            n (int): Número de preguntas a generar.
+            
+        Returns:
+            List[str]: Hasta n preguntas, en el orden devuelto por el modelo.
+        """
+        payload = {
+            "model": self.modelo,
+            "messages": self._construir_mensajes(
+                conversacion, prompt_base, INSTRUCCION_PREGUNTAS_MULTIPLES.format(n=n)
+            ),
+            "max_tokens": 250 * n,
+            "temperature": 0.7
+        }
+        
+        try:
+            response = self._post(payload)
+            
+            # Si hay error, mostrar el mensaje detallado de la API
+            if not response.ok:
+                self._reportar_error(response)
+            
+            texto = self._extraer_pregunta(deserializar(response.content))
         
+        except Exception as e:
+            print(f"Error al generar preguntas con OpenRouter: {str(e)}")
+            return [PREGUNTA_RESPALDO_API]
+        
+        preguntas = [
+            m.replace(PREFIJO_ENTREVISTADOR, "").strip()
+            for m in _PREGUNTA_NUMERADA_RE.findall(texto)
+        ]
+        preguntas = [p for p in preguntas if p]
+        
+        # Si el modelo no numeró las preguntas, se usa la respuesta completa
+        return preguntas[:n] if preguntas else [texto]
+    
+    async def agenerar_pregunta(self, conversacion: List[Dict[str, str]], prompt_base: str) -> str:
+        """
+        Versión asíncrona de `generar_pregunta` basada en httpx.AsyncClient.
+        
+        Permite lanzar muchas peticiones concurrentes sin bloquear el bucle de eventos.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            
+        Returns:
+            str: La nueva pregunta generada.
+        """
+        clave = CacheExacta.clave(self.modelo, prompt_base, conversacion)
+        pregunta = self._cache_respuestas.obtener(clave)
+        if pregunta is not None:
+            return pregunta
+        
+        # En un hilo: si hay que resumir el historial, se hace con una petición síncrona
+        mensajes = await asyncio.to_thread(self._construir_mensajes, conversacion, prompt_base)
         payload = {
             "model": self.modelo,
             "messages": mensajes,
@@ -86,46 +612,211 @@ class OpenRouterConversacion:
         }
         
         try:
-            # Realizar la solicitud a OpenRouter
-            response = requests.post(self.url, headers=self.headers, json=payload)
+            response = await self._apost(payload)
             
-            # Si hay error, intentar obtener el mensaje detallado de la API
-            if not response.ok:
-                error_detail = "Detalles no disponibles"
-                try:
-                    error_json = response.json()
-                    if "error" in error_json:
-                        if isinstance(error_json["error"], dict) and "message" in error_json["error"]:
-                            error_detail = error_json["error"]["message"]
-                        elif isinstance(error_json["error"], str):
-                            error_detail = error_json["error"]
-                except:
-                    pass
-                
-                print(f"Error en la API de OpenRouter ({response.status_code}): {error_detail}")
-                print(f"Modelo solicitado: {self.modelo}")
-                response.raise_for_status()
-            
-            resultado = response.json()
-            
-            # Extraer la respuesta
-            if "choices" in resultado and len(resultado["choices"]) > 0:
-                if "message" in resultado["choices"][0] and "content" in resultado["choices"][0]["message"]:
-                    nueva_pregunta = resultado["choices"][0]["message"]["content"].strip()
-                    # Limpiar la respuesta si es necesario
-                    nueva_pregunta = nueva_pregunta.replace("Entrevistador:", "").strip()
-                    return nueva_pregunta
-                else:
-                    print("Formato de respuesta inesperado. Estructura de 'choices':", resultado["choices"])
-            else:
-                print("Respuesta sin 'choices' o vacía:", resultado)
+            # Si hay error, mostrar el mensaje detallado de la API
+            if response.is_error:
+                self._reportar_error(response)
             
-            # Si llegamos aquí, algo falló en la estructura de la respuesta
-            return "¿Podrías contarme más sobre tus habilidades técnicas?"
+            pregunta = self._extraer_pregunta(deserializar(response.content))
+            self._cachear_pregunta(clave, pregunta)
+            return pregunta
         
         except Exception as e:
             print(f"Error al generar pregunta con OpenRouter: {str(e)}")
-            return "¿Cómo relacionarías tu experiencia previa con este puesto específicamente?"
+            return PREGUNTA_RESPALDO_API
+    
+    def _cachear_pregunta(self, clave: str, pregunta: str) -> None:
+        """Guarda la pregunta en la caché exacta salvo que sea una pregunta de respaldo."""
+        if pregunta and pregunta not in PREGUNTAS_RESPALDO:
+            self._cache_respuestas.agregar(clave, pregunta)
+    
+    def _get_cliente_async(self) -> "httpx.AsyncClient":
+        """
+        Devuelve el cliente HTTP asíncrono, creándolo en el primer uso.
+        
+        El cliente queda ligado al bucle de eventos en el que se crea, así que se
+        vuelve a crear si se usa desde otro bucle (p. ej. otra llamada a asyncio.run).
+        
+        Returns:
+            httpx.AsyncClient: Cliente con las cabeceras de OpenRouter.
+        """
+        if httpx is None:
+            raise ImportError("La versión asíncrona requiere httpx (pip install httpx)")
+        
+        loop = asyncio.get_running_loop()
+        if self._cliente_async is None or self._loop_async is not loop:
+            self._cliente_async = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(TIMEOUT_PETICION[1], connect=TIMEOUT_PETICION[0]),
+                http2=HTTP2_DISPONIBLE,
+                limits=httpx.Limits(max_keepalive_connections=32)
+            )
+            self._loop_async = loop
+        return self._cliente_async
+    
+    def _extraer_pregunta(self, resultado: Dict[str, Any]) -> str:
+        """
+        Extrae la pregunta de la respuesta JSON de la API.
+        
+        Args:
+            resultado (Dict[str, Any]): Respuesta de OpenRouter ya decodificada.
+            
+        Returns:
+            str: La pregunta, o una pregunta de respaldo si el formato no es el esperado.
+        """
+        if "choices" in resultado and len(resultado["choices"]) > 0:
+            if "message" in resultado["choices"][0] and "content" in resultado["choices"][0]["message"]:
+                nueva_pregunta = resultado["choices"][0]["message"]["content"].strip()
+                # Limpiar la respuesta si es necesario
+                nueva_pregunta = nueva_pregunta.replace(PREFIJO_ENTREVISTADOR, "").strip()
+                return nueva_pregunta
+            else:
+                print("Formato de respuesta inesperado. Estructura de 'choices':", resultado["choices"])
+        else:
+            print("Respuesta sin 'choices' o vacía:", resultado)
+        
+        # Si llegamos aquí, algo falló en la estructura de la respuesta
+        return PREGUNTA_RESPALDO_FORMATO
+    
+    def generar_pregunta_stream(self, conversacion: List[Dict[str, str]], prompt_base: str) -> Iterator[str]:
+        """
+        Genera una nueva pregunta usando OpenRouter, devolviendo el texto a medida que llega.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            
+        Yields:
+            str: Fragmentos de la nueva pregunta en el orden en que los envía el modelo.
+        """
+        clave = CacheExacta.clave(self.modelo, prompt_base, conversacion)
+        pregunta = self._cache_respuestas.obtener(clave)
+        if pregunta is not None:
+            yield pregunta
+            return
+        
+        fragmentos = []
+        emitido = False
+        
+        try:
+            for fragmento in self.stream(conversacion, prompt_base):
+                emitido = True
+                fragmentos.append(fragmento)
+                yield fragmento
+            
+            if not emitido:
+                print("Respuesta en streaming vacía.")
+                yield PREGUNTA_RESPALDO_FORMATO
+            else:
+                self._cachear_pregunta(clave, "".join(fragmentos).strip())
+        
+        except Exception as e:
+            print(f"Error al generar pregunta en streaming con OpenRouter: {str(e)}")
+            if not emitido:
+                yield PREGUNTA_RESPALDO_API
+    
+    def stream(self, conversacion: List[Dict[str, str]], prompt_base: str,
+               cancelado: Optional[threading.Event] = None,
+               al_conectar: Optional[Callable[[requests.Response], None]] = None) -> Iterator[str]:
+        """
+        Devuelve los fragmentos de la respuesta del modelo a medida que llegan (SSE).
+        
+        A diferencia de `generar_pregunta_stream`, no usa preguntas de respaldo:
+        los errores se propagan y una respuesta vacía no produce fragmentos.
+        
+        Args:
+            conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+            prompt_base (str): Prompt base con instrucciones para el modelo.
+            cancelado (threading.Event, opcional): Si se activa, el stream termina sin
+                más fragmentos (y sin reintentos).
+            al_conectar (Callable, opcional): Recibe la respuesta en cuanto se abre,
+                para que otro hilo pueda cerrarla y cortar la conexión.
+            
+        Yields:
+            str: Fragmentos de la nueva pregunta.
+        """
+        payload = {
+            "model": self.modelo,
+            "messages": self._construir_mensajes(conversacion, prompt_base),
+            "max_tokens": 250,
+            "temperature": 0.7,
+            "stream": True
+        }
+        
+        # Se retiene el inicio de la respuesta para poder quitar el prefijo "Entrevistador:"
+        inicio = ""
+        
+        response = self._post(payload, stream=True, cancelado=cancelado)
+        if response is None:
+            return
+        if al_conectar is not None:
+            al_conectar(response)
+        
+        with response:
+            if not response.ok:
+                self._reportar_error(response)
+            
+            # Eventos SSE: líneas "data: {...}" terminadas con "data: [DONE]".
+            # Se leen como bytes: sin charset en la cabecera, requests decodificaría
+            # el texto como ISO-8859-1 y estropearía los acentos
+            for linea in response.iter_lines():
+                if not linea or not linea.startswith(b"data:"):
+                    continue
+                datos = linea[len(b"data:"):].strip()
+                if datos == b"[DONE]":
+                    break
+                if cancelado is not None and cancelado.is_set():
+                    return
+                
+                evento = deserializar(datos)
+                choices = evento.get("choices") or []
+                if not choices:
+                    continue
+                fragmento = (choices[0].get("delta") or {}).get("content")
+                if not fragmento:
+                    continue
+                
+                if inicio is not None:
+                    inicio += fragmento
+                    texto = inicio.lstrip()
+                    # Esperar hasta saber si la respuesta empieza con el prefijo
+                    if len(texto) < len(PREFIJO_ENTREVISTADOR) and PREFIJO_ENTREVISTADOR.startswith(texto):
+                        continue
+                    if texto.startswith(PREFIJO_ENTREVISTADOR):
+                        texto = texto[len(PREFIJO_ENTREVISTADOR):].lstrip()
+                    inicio = None
+                    if not texto:
+                        continue
+                    fragmento = texto
+                
+                yield fragmento
+        
+        if inicio and inicio.strip():
+            yield inicio.strip()
+
+
+def _crear_conversacion(nombre_modelo: Optional[str] = None) -> OpenRouterConversacion:
+    """
+    Devuelve la conversación con OpenRouter para el modelo indicado.
+    
+    Se crea una sola instancia por modelo y se reutiliza en los turnos siguientes.
+    
+    Args:
+        nombre_modelo (Optional[str]): Nombre corto o ID completo del modelo (opcional).
+        
+    Returns:
+        OpenRouterConversacion: Instancia lista para generar preguntas.
+    """
+    # Manejar modelos genéricos y convertirlos a IDs válidos de OpenRouter
+    modelo_especifico = nombre_modelo or "meta-llama/llama-3.3-8b-instruct:free"
+    modelo_especifico = _ALIAS_MODELOS.get(modelo_especifico, modelo_especifico)
+    
+    if modelo_especifico not in _CONVERSACIONES:
+        print(f"Usando modelo: {modelo_especifico}")
+        _CONVERSACIONES[modelo_especifico] = OpenRouterConversacion(modelo=modelo_especifico)
+    
+    return _CONVERSACIONES[modelo_especifico]
 
 
 def generar_pregunta(
@@ -145,28 +836,238 @@ def generar_pregunta(
         str: La nueva pregunta generada.
     """
     try:
-        # Manejar modelos genéricos y convertirlos a IDs válidos de OpenRouter
-        modelo_especifico = nombre_modelo or "meta-llama/llama-3.3-8b-instruct:free"
+        modelo = _crear_conversacion(nombre_modelo)
         
-        # Mapeo de nombres cortos a IDs completos en OpenRouter
-        modelo_mapping = {
-            "meta-llama" : "meta-llama/llama-3.3-8b-instruct:free",
-        }
+        # Generar y devolver la pregunta
+        return modelo.generar_pregunta(conversacion, prompt_base)
+    
+    except Exception as e:
+        print(f"Error al generar pregunta: {str(e)}")
+        # Pregunta de respaldo en caso de error
+        return PREGUNTA_RESPALDO_ERROR
+
+
+def generar_preguntas_multiples(
+    conversacion: List[Dict[str, str]], 
+    prompt_base: str, 
+    n: int = 3,
+    nombre_modelo: Optional[str] = None
+) -> List[str]:
+    """
+    Genera n preguntas alternativas para el siguiente turno en una sola petición.
+    
+    Args:
+        conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+        prompt_base (str): Prompt base con instrucciones para el modelo.
+        n (int): Número de preguntas a generar.
+        nombre_modelo (Optional[str]): Nombre específico del modelo a utilizar (opcional).
         
-        # Si se usó un nombre corto, convertirlo al ID completo
-        if modelo_especifico in modelo_mapping:
-            modelo_especifico = modelo_mapping[modelo_especifico]
-            print(f"Usando modelo: {modelo_especifico}")
+    Returns:
+        List[str]: Las preguntas generadas.
+    """
+    try:
+        modelo = _crear_conversacion(nombre_modelo)
+        return modelo.generar_preguntas_multiples(conversacion, prompt_base, n)
+    
+    except Exception as e:
+        print(f"Error al generar preguntas: {str(e)}")
+        return [PREGUNTA_RESPALDO_ERROR]
+
+
+async def agenerar_pregunta(
+    conversacion: List[Dict[str, str]], 
+    prompt_base: str, 
+    nombre_modelo: Optional[str] = None
+) -> str:
+    """
+    Versión asíncrona de `generar_pregunta`.
+    
+    Args:
+        conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+        prompt_base (str): Prompt base con instrucciones para el modelo.
+        nombre_modelo (Optional[str]): Nombre específico del modelo a utilizar (opcional).
         
-        modelo = OpenRouterConversacion(modelo=modelo_especifico)
+    Returns:
+        str: La nueva pregunta generada.
+    """
+    try:
+        modelo = _crear_conversacion(nombre_modelo)
+        return await modelo.agenerar_pregunta(conversacion, prompt_base)
+    
+    except Exception as e:
+        print(f"Error al generar pregunta: {str(e)}")
+        # Pregunta de respaldo en caso de error
+        return PREGUNTA_RESPALDO_ERROR
+
+
+async def agenerar_preguntas_batch(
+    items: List[Tuple[List[Dict[str, str]], str, Optional[str]]], 
+    concurrency: int = 8
+) -> List[str]:
+    """
+    Genera varias preguntas en paralelo, con un máximo de peticiones simultáneas.
+    
+    Los clientes HTTP asíncronos siguen abiertos al terminar; ver `acerrar_clientes`.
+    
+    Args:
+        items (List[Tuple]): Tuplas (conversacion, prompt_base, nombre_modelo).
+        concurrency (int): Número máximo de peticiones en vuelo a la vez.
         
-        # Generar y devolver la pregunta
-        return modelo.generar_pregunta(conversacion, prompt_base)
+    Returns:
+        List[str]: Las preguntas generadas, en el mismo orden que `items`.
+    """
+    semaforo = asyncio.Semaphore(concurrency)
+    
+    async def generar(conversacion, prompt_base, nombre_modelo):
+        async with semaforo:
+            return await agenerar_pregunta(conversacion, prompt_base, nombre_modelo)
     
+    return await asyncio.gather(*(generar(*item) for item in items))
+
+
+async def acerrar_clientes() -> None:
+    """
+    Cierra los clientes HTTP asíncronos de todas las conversaciones.
+    
+    Los clientes se comparten entre todas las corrutinas del proceso, así que
+    esta función debe llamarse una sola vez al terminar (dentro del mismo bucle
+    de eventos que los usó), no después de cada lote.
+    """
+    await asyncio.gather(*(c.aclose() for c in list(_CONVERSACIONES.values())))
+
+
+def generar_pregunta_stream(
+    conversacion: List[Dict[str, str]], 
+    prompt_base: str, 
+    nombre_modelo: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Genera una nueva pregunta devolviendo los fragmentos de texto a medida que llegan.
+    
+    Permite mostrar la pregunta y empezar a sintetizarla antes de que el modelo
+    termine de generarla.
+    
+    Args:
+        conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+        prompt_base (str): Prompt base con instrucciones para el modelo.
+        nombre_modelo (Optional[str]): Nombre específico del modelo a utilizar (opcional).
+        
+    Yields:
+        str: Fragmentos de la nueva pregunta.
+    """
+    try:
+        modelo = _crear_conversacion(nombre_modelo)
     except Exception as e:
         print(f"Error al generar pregunta: {str(e)}")
         # Pregunta de respaldo en caso de error
-        return "Interesante. ¿Puedes contarme más sobre tu experiencia en ese aspecto?"
+        yield PREGUNTA_RESPALDO_ERROR
+        return
+    
+    yield from modelo.generar_pregunta_stream(conversacion, prompt_base)
+
+
+def generar_pregunta_stream_cubierta(
+    conversacion: List[Dict[str, str]], 
+    prompt_base: str, 
+    nombres_modelos: List[str]
+) -> Iterator[str]:
+    """
+    Lanza la misma petición en streaming contra varios modelos y usa el primero que responda.
+    
+    El primer modelo que envía un fragmento gana y los demás se cancelan en ese
+    momento: se cierra su conexión y se abandonan sus reintentos. Así la latencia
+    de cola queda acotada por el modelo más rápido en cada turno.
+    
+    Las conversaciones se crean al llamar a la función (no al consumir los
+    fragmentos), de modo que sus mensajes no se mezclan con la pregunta mostrada.
+    
+    Args:
+        conversacion (List[Dict[str, str]]): Lista de diccionarios con la conversación.
+        prompt_base (str): Prompt base con instrucciones para el modelo.
+        nombres_modelos (List[str]): Modelos a consultar en paralelo.
+        
+    Returns:
+        Iterator[str]: Fragmentos de la nueva pregunta del modelo ganador.
+    """
+    conversaciones = {}
+    for nombre_modelo in nombres_modelos:
+        try:
+            conversaciones[nombre_modelo] = _crear_conversacion(nombre_modelo)
+        except Exception as e:
+            print(f"Error al generar pregunta con {nombre_modelo}: {str(e)}")
+    
+    if not conversaciones:
+        return iter([PREGUNTA_RESPALDO_ERROR])
+    
+    return _stream_cubierto(conversacion, prompt_base, conversaciones)
+
+
+def _stream_cubierto(
+    conversacion: List[Dict[str, str]], 
+    prompt_base: str, 
+    conversaciones: Dict[str, OpenRouterConversacion]
+) -> Iterator[str]:
+    """Consume en paralelo los streams de `generar_pregunta_stream_cubierta`."""
+    cola = queue.Queue()
+    lock = threading.Lock()
+    cancelados = {nombre: threading.Event() for nombre in conversaciones}
+    respuestas = {}
+    estado = {"ganador": None, "fallidos": 0}
+    
+    def registrar_respuesta(nombre_modelo: str, response: requests.Response) -> None:
+        with lock:
+            respuestas[nombre_modelo] = response
+            perdedor = estado["ganador"] not in (None, nombre_modelo)
+        if perdedor:
+            response.close()
+    
+    def consumir(nombre_modelo: str) -> None:
+        es_ganador = False
+        try:
+            fragmentos = conversaciones[nombre_modelo].stream(
+                conversacion, prompt_base,
+                cancelado=cancelados[nombre_modelo],
+                al_conectar=lambda response: registrar_respuesta(nombre_modelo, response)
+            )
+            for fragmento in fragmentos:
+                if not es_ganador:
+                    with lock:
+                        if estado["ganador"] is not None:
+                            return
+                        estado["ganador"] = nombre_modelo
+                        perdedores = [n for n in conversaciones if n != nombre_modelo]
+                        abiertas = [respuestas[n] for n in perdedores if n in respuestas]
+                    es_ganador = True
+                    
+                    # Cancelar a los demás: cortar su conexión y sus reintentos
+                    for n in perdedores:
+                        cancelados[n].set()
+                    for response in abiertas:
+                        response.close()
+                cola.put(fragmento)
+        except Exception as e:
+            # Los errores de un stream cancelado (conexión cerrada) son esperables
+            if not cancelados[nombre_modelo].is_set():
+                print(f"Error al generar pregunta con {nombre_modelo}: {str(e)}")
+        finally:
+            if es_ganador:
+                cola.put(None)
+            else:
+                with lock:
+                    if estado["ganador"] is None:
+                        estado["fallidos"] += 1
+                        if estado["fallidos"] == len(conversaciones):
+                            cola.put(PREGUNTA_RESPALDO_ERROR)
+                            cola.put(None)
+    
+    for nombre_modelo in conversaciones:
+        threading.Thread(target=consumir, args=(nombre_modelo,), daemon=True).start()
+    
+    yield from iter(cola.get, None)
+    
+    # Se informa al final, en su propia línea, para no cortar la pregunta mostrada
+    if estado["ganador"] is not None:
+        print(f"\n(Respuesta más rápida: {estado['ganador']})", end='')
 
 
 if __name__ == "__main__":
@@ -189,7 +1090,7 @@ if __name__ == "__main__":
     ]
     
     # Probar con OpenRouter
-    if OPENROUTER_API_KEY:
+    if OPENROUTER_API_KEYS:
         # Modelo predeterminado (GPT-3.5)
         print("\nProbando con OpenRouter usando modelo predeterminado:")
         try:
@@ -204,14 +1105,19 @@ if __name__ == "__main__":
             "mistral"    # Se convierte automáticamente a "mistralai/mistral-7b-instruct"
         ]
         
-        for modelo_alt in modelos_alternativos:
-            print(f"\nProbando con modelo alternativo: {modelo_alt}")
+        # Probar todos los modelos alternativos a la vez
+        print(f"\nProbando con modelos alternativos: {', '.join(modelos_alternativos)}")
+        async def probar_alternativos():
             try:
-                pregunta_alt = generar_pregunta(conversacion_ejemplo, prompt, modelo_alt)
-                print(f"Pregunta generada: {pregunta_alt}")
-                break  # Si tiene éxito, termina el bucle
-            except Exception as e:
-                print(f"Error con {modelo_alt}: {str(e)}")
+                return await agenerar_preguntas_batch(
+                    [(conversacion_ejemplo, prompt, modelo_alt) for modelo_alt in modelos_alternativos]
+                )
+            finally:
+                await acerrar_clientes()
+        
+        preguntas_alt = asyncio.run(probar_alternativos())
+        for modelo_alt, pregunta_alt in zip(modelos_alternativos, preguntas_alt):
+            print(f"Pregunta generada con {modelo_alt}: {pregunta_alt}")
     else:
         print("No se encontró la clave API de OpenRouter. Configura la variable de entorno OPENROUTER_API_KEY.")
         print("Ejemplo: export OPENROUTER_API_KEY='tu_clave_api_aquí'")
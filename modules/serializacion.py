@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Módulo con la serialización JSON compartida por el resto de módulos.
+Usa orjson si está instalado y, si no, el módulo json de la biblioteca estándar.
+"""
+
+import json
+from typing import Any
+
+# orjson es bastante más rápido que json; se usa si está instalado
+try:
+    import orjson
+    
+    def serializar(obj: Any) -> bytes:
+        """Serializa un objeto a JSON en UTF-8."""
+        return orjson.dumps(obj)
+    
+    def deserializar(datos: Any) -> Any:
+        """Decodifica un JSON (str o bytes en UTF-8)."""
+        return orjson.loads(datos)
+except ImportError:
+    def serializar(obj: Any) -> bytes:
+        """Serializa un objeto a JSON en UTF-8."""
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+    
+    def deserializar(datos: Any) -> Any:
+        """Decodifica un JSON (str o bytes en UTF-8)."""
+        return json.loads(datos)
@@ -6,13 +6,78 @@ Módulo para la captura y transcripción de audio usando Whisper.
 Permite grabar audio desde el micrófono y convertirlo a texto.
 """
 
-import os
+import queue
 import tempfile
+import functools
+import threading
 import numpy as np
+import torch
 import sounddevice as sd
 import soundfile as sf
-import whisper
-from scipy.io.wavfile import write
+
+# faster-whisper (CTranslate2) es el motor preferido; openai-whisper queda como
+# alternativa si no está instalado
+try:
+    from faster_whisper import WhisperModel, BatchedInferencePipeline
+except ImportError:
+    WhisperModel = None
+    BatchedInferencePipeline = None
+
+try:
+    import whisper
+except ImportError:
+    whisper = None
+
+# silero-vad es opcional: recorta el audio a los tramos con voz antes de
+# pasarlo a openai-whisper (faster-whisper ya trae su propio VAD)
+try:
+    from silero_vad import load_silero_vad, get_speech_timestamps
+except ImportError:
+    load_silero_vad = None
+    get_speech_timestamps = None
+
+# Frecuencia de muestreo de las grabaciones (la que espera Whisper)
+FRECUENCIA_GRABACION = 16000
+
+# Transcriptores ya cargados por (tamaño de modelo, por lotes)
+_TRANSCRIPTORES = {}
+_TRANSCRIPTORES_LOCK = threading.Lock()
+
+def _preparar_entrada(audio):
+    """Deja el audio en memoria como vector float32; las rutas se devuelven sin cambios."""
+    if isinstance(audio, np.ndarray):
+        return np.ascontiguousarray(audio, dtype=np.float32).ravel()
+    return audio
+
+@functools.lru_cache(maxsize=1)
+def _cargar_modelo_vad():
+    """Carga el modelo de silero-vad una sola vez por proceso."""
+    return load_silero_vad()
+
+def _filtrar_voz(audio):
+    """
+    Deja solo los tramos con voz del audio usando silero-vad, si está instalado.
+    
+    Args:
+        audio: Audio en memoria (numpy.ndarray float32 a 16 kHz) o ruta a un archivo.
+        
+    Returns:
+        El audio con los tramos de voz concatenados; las rutas, el audio sin voz
+        detectada o la ausencia de silero-vad lo dejan sin cambios.
+    """
+    if get_speech_timestamps is None or not isinstance(audio, np.ndarray):
+        return audio
+    
+    tramos = get_speech_timestamps(torch.from_numpy(audio), _cargar_modelo_vad(),
+                                   sampling_rate=FRECUENCIA_GRABACION)
+    if not tramos:
+        return audio
+    return np.concatenate([audio[t["start"]:t["end"]] for t in tramos])
+
+@functools.lru_cache(maxsize=4)
+def _cargar_modelo_whisper(modelo):
+    """Carga el modelo de Whisper del tamaño indicado una sola vez por proceso."""
+    return whisper.load_model(modelo)
 
 class WhisperTranscriptor:
     """Clase para manejar la transcripción de audio con Whisper."""
@@ -24,91 +89,342 @@ class WhisperTranscriptor:
         Args:
             modelo (str): Tamaño del modelo de Whisper ('tiny', 'base', 'small', 'medium', 'large')
         """
-        self.modelo = whisper.load_model(modelo)
+        if whisper is None:
+            raise ImportError("La transcripción requiere faster-whisper u openai-whisper")
+        
+        self.modelo = _cargar_modelo_whisper(modelo)
     
-    def transcribir_archivo(self, ruta_archivo):
+    def transcribir_archivo(self, ruta_archivo, texto_previo=None):
         """
         Transcribe un archivo de audio usando Whisper.
         
         Args:
-            ruta_archivo (str): Ruta al archivo de audio a transcribir.
+            ruta_archivo (str | numpy.ndarray): Ruta al archivo de audio a transcribir,
+                o el audio ya en memoria (mono, 16 kHz).
+            texto_previo (str, opcional): Texto ya transcrito de la misma respuesta,
+                usado como contexto inicial del decodificador.
             
         Returns:
             str: Texto transcrito del archivo de audio.
         """
-        resultado = self.modelo.transcribe(ruta_archivo, language="es")
+        # Sin condicionar con el texto anterior (las respuestas son cortas) y en
+        # FP16 cuando hay GPU
+        resultado = self.modelo.transcribe(
+            _filtrar_voz(_preparar_entrada(ruta_archivo)),
+            language="es",
+            fp16=torch.cuda.is_available(),
+            condition_on_previous_text=False,
+            no_speech_threshold=0.6,
+            compression_ratio_threshold=2.4,
+            initial_prompt=texto_previo
+        )
         return resultado["text"]
 
-def grabar_audio(duracion_max=30, fs=16000):
+class WhisperTranscriptorRapido:
+    """
+    Clase para transcribir con faster-whisper (CTranslate2).
+    
+    Usa pesos cuantizados (int8) y el filtro VAD de faster-whisper, que descarta
+    los tramos sin voz antes de decodificar.
+    """
+    
+    def __init__(self, modelo="base", compute_type=None):
+        """
+        Inicializa el transcriptor de faster-whisper.
+        
+        Args:
+            modelo (str): Tamaño del modelo de Whisper ('tiny', 'base', 'small', 'medium', 'large')
+            compute_type (str, opcional): Precisión de CTranslate2 (p. ej. 'float16' en GPU).
+                Por defecto 'int8_float16' en GPU e 'int8' en CPU.
+        """
+        if WhisperModel is None:
+            raise ImportError("Este transcriptor requiere faster-whisper (pip install faster-whisper)")
+        
+        usar_cuda = torch.cuda.is_available()
+        if compute_type is None:
+            compute_type = "int8_float16" if usar_cuda else "int8"
+        
+        self.modelo = WhisperModel(modelo, device="cuda" if usar_cuda else "cpu", compute_type=compute_type)
+    
+    def transcribir_archivo(self, ruta_archivo, texto_previo=None):
+        """
+        Transcribe un archivo de audio usando faster-whisper.
+        
+        Args:
+            ruta_archivo (str | numpy.ndarray): Ruta al archivo de audio a transcribir,
+                o el audio ya en memoria (mono, 16 kHz).
+            texto_previo (str, opcional): Texto ya transcrito de la misma respuesta,
+                usado como contexto inicial del decodificador.
+            
+        Returns:
+            str: Texto transcrito del archivo de audio.
+        """
+        segmentos, _ = self.modelo.transcribe(_preparar_entrada(ruta_archivo), language="es", vad_filter=True,
+                                              initial_prompt=texto_previo)
+        return "".join(segmento.text for segmento in segmentos)
+
+class WhisperTranscriptorPorLotes(WhisperTranscriptorRapido):
+    """
+    Clase para transcribir con faster-whisper por lotes.
+    
+    El audio se divide en segmentos de voz (VAD) que se decodifican juntos con
+    BatchedInferencePipeline, lo que acelera mucho las respuestas largas.
+    """
+    
+    def __init__(self, modelo="base", batch_size=8, compute_type=None):
+        """
+        Inicializa el transcriptor por lotes.
+        
+        Args:
+            modelo (str): Tamaño del modelo de Whisper ('tiny', 'base', 'small', 'medium', 'large')
+            batch_size (int): Número de segmentos que se decodifican a la vez.
+            compute_type (str, opcional): Precisión de CTranslate2 (p. ej. 'float16' en GPU).
+                Por defecto 'int8_float16' en GPU e 'int8' en CPU.
+        """
+        if BatchedInferencePipeline is None:
+            raise ImportError("La transcripción por lotes requiere faster-whisper (pip install faster-whisper)")
+        
+        super().__init__(modelo=modelo, compute_type=compute_type)
+        self.batch_size = batch_size
+        self.pipeline = BatchedInferencePipeline(model=self.modelo)
+    
+    def transcribir_archivo(self, ruta_archivo, texto_previo=None):
+        """
+        Transcribe un archivo de audio por lotes.
+        
+        Args:
+            ruta_archivo (str | numpy.ndarray): Ruta al archivo de audio a transcribir,
+                o el audio ya en memoria (mono, 16 kHz).
+            texto_previo (str, opcional): Texto ya transcrito de la misma respuesta,
+                usado como contexto inicial del decodificador.
+            
+        Returns:
+            str: Texto transcrito del archivo de audio.
+        """
+        segmentos, _ = self.pipeline.transcribe(_preparar_entrada(ruta_archivo), language="es", batch_size=self.batch_size,
+                                                initial_prompt=texto_previo)
+        return "".join(segmento.text for segmento in segmentos)
+
+def get_transcriptor(modelo="base", por_lotes=False):
+    """
+    Devuelve el transcriptor del modelo indicado, cargándolo solo la primera vez.
+    
+    Args:
+        modelo (str): Tamaño del modelo de Whisper.
+        por_lotes (bool): Si es True, usa faster-whisper con transcripción por lotes
+            (si no está instalado se usa Whisper normal).
+        
+    Returns:
+        WhisperTranscriptorRapido | WhisperTranscriptorPorLotes | WhisperTranscriptor:
+            Transcriptor con el modelo ya cargado. Sin faster-whisper se usa openai-whisper.
+    """
+    if por_lotes and BatchedInferencePipeline is None:
+        print("faster-whisper no está instalado; se usará Whisper sin lotes.")
+        por_lotes = False
+    
+    clave = (modelo, por_lotes)
+    with _TRANSCRIPTORES_LOCK:
+        if clave not in _TRANSCRIPTORES:
+            if por_lotes:
+                _TRANSCRIPTORES[clave] = WhisperTranscriptorPorLotes(modelo=modelo)
+            elif WhisperModel is not None:
+                _TRANSCRIPTORES[clave] = WhisperTranscriptorRapido(modelo=modelo)
+            else:
+                _TRANSCRIPTORES[clave] = WhisperTranscriptor(modelo=modelo)
+        return _TRANSCRIPTORES[clave]
+
+def preparar_grabacion(modelo_whisper="base", por_lotes=False):
+    """
+    Deja listo todo lo necesario para grabar y transcribir.
+    
+    Carga el modelo de Whisper e inicializa el dispositivo de entrada, de modo
+    que puede ejecutarse mientras el entrevistador habla y la primera respuesta
+    no pague ese coste.
+    
+    Args:
+        modelo_whisper (str): Tamaño del modelo de Whisper a utilizar.
+        por_lotes (bool): Si es True, prepara el transcriptor por lotes.
+    """
+    sd.check_input_settings(samplerate=FRECUENCIA_GRABACION, channels=1, dtype='float32')
+    get_transcriptor(modelo_whisper, por_lotes)
+
+def _recortar_silencio_final(audio, umbral):
+    """
+    Recorta el silencio del final de la grabación.
+    
+    Busca con NumPy (sin recorrer las muestras en Python) la última muestra que
+    supera el umbral y descarta todo lo que viene detrás.
+    
+    Args:
+        audio (numpy.ndarray): Audio mono grabado.
+        umbral (float): Amplitud por debajo de la cual se considera silencio.
+        
+    Returns:
+        numpy.ndarray: El audio recortado, o el original si no hay ninguna muestra de voz.
+    """
+    voz = np.flatnonzero(np.abs(audio) >= umbral)
+    if voz.size == 0:
+        return audio
+    return audio[:voz[-1] + 1]
+
+def grabar_audio(duracion_max=30, fs=FRECUENCIA_GRABACION, cola_fragmentos=None, duracion_fragmento=5.0,
+                 detener=None):
     """
-    Graba audio desde el micrófono.
+    Graba audio desde el micrófono hasta detectar silencio.
+    
+    El audio se recibe por bloques en el callback de un InputStream, que calcula
+    el nivel RMS de cada bloque y termina la grabación en cuanto se acumula el
+    tiempo de silencio configurado tras haber detectado voz, sin esperar a la
+    duración máxima. Si el candidato no empieza a hablar en unos segundos, la
+    grabación también termina (y se devuelve vacía).
     
     Args:
         duracion_max (int): Duración máxima de la grabación en segundos.
         fs (int): Frecuencia de muestreo en Hz.
+        cola_fragmentos (queue.Queue, opcional): Si se indica, se van enviando
+            fragmentos de la grabación mientras continúa (cortados en una pausa
+            tras al menos `duracion_fragmento` segundos), y None al terminar.
+        duracion_fragmento (float): Duración mínima de cada fragmento en segundos.
+        detener (threading.Event, opcional): Si se activa, la grabación termina
+            en el siguiente bloque.
         
     Returns:
         numpy.ndarray: Array con los datos de audio grabados.
     """
     print("Grabando... (Habla ahora)")
     
-    # Crear array para almacenar la grabación
-    grabacion = sd.rec(int(duracion_max * fs), samplerate=fs, channels=1, dtype='float32')
-    
     # Configurar detección de silencio para detener la grabación
-    umbral_silencio = 0.02
-    tiempo_silencio = 2.0  # segundos de silencio para terminar
-    muestras_silencio = int(tiempo_silencio * fs)
-    contador_silencio = 0
-    
-    # Monitorear el audio y detectar silencio
-    for i in range(int(duracion_max * fs)):
-        sd.wait()
-        if i < len(grabacion) and abs(grabacion[i]) < umbral_silencio:
-            contador_silencio += 1
-        else:
-            contador_silencio = 0
-        
-        if contador_silencio >= muestras_silencio:
-            # Recortar la grabación hasta donde se detectó actividad
-            grabacion = grabacion[:i - muestras_silencio]
-            break
+    umbral_silencio = 0.02  # amplitud de una muestra
+    umbral_rms = 0.007  # nivel RMS de un bloque (unos 9 dB por debajo del pico)
+    tiempo_silencio = 2.0  # segundos de silencio tras la voz para terminar
+    tiempo_espera_voz = 8.0  # segundos máximos hasta que el candidato empieza a hablar
+    tamano_bloque = 1024
+    bloques_silencio = int(np.ceil(tiempo_silencio * fs / tamano_bloque))
+    muestras_espera_voz = int(tiempo_espera_voz * fs)
+    
+    # Buffer reservado de antemano para toda la duración máxima
+    total_muestras = int(duracion_max * fs)
+    grabacion = np.empty(total_muestras, dtype=np.float32)
+    muestras_fragmento = int(duracion_fragmento * fs)
+    estado = {"muestras": 0, "bloques_silencio": 0, "inicio_fragmento": 0, "hubo_voz": False}
+    terminado = threading.Event()
+    
+    def callback(indata, frames, tiempo, status):
+        inicio = estado["muestras"]
+        n = min(frames, total_muestras - inicio)
+        bloque = indata[:n, 0]
+        grabacion[inicio:inicio + n] = bloque
+        estado["muestras"] = inicio + n
+        
+        rms = np.sqrt(np.mean(np.square(bloque))) if n else 0.0
+        silencio = rms < umbral_rms
+        if not silencio:
+            estado["hubo_voz"] = True
+            estado["bloques_silencio"] = 0
+        elif estado["hubo_voz"]:
+            # El silencio solo cuenta una vez que el candidato ha empezado a hablar
+            estado["bloques_silencio"] += 1
+        
+        # Enviar el fragmento acumulado aprovechando una pausa, para no cortar palabras
+        if (cola_fragmentos is not None and silencio and estado["hubo_voz"]
+                and estado["muestras"] - estado["inicio_fragmento"] >= muestras_fragmento):
+            cola_fragmentos.put(grabacion[estado["inicio_fragmento"]:estado["muestras"]].copy())
+            estado["inicio_fragmento"] = estado["muestras"]
+        
+        sin_respuesta = not estado["hubo_voz"] and estado["muestras"] >= muestras_espera_voz
+        detenido = detener is not None and detener.is_set()
+        if (estado["bloques_silencio"] >= bloques_silencio or sin_respuesta or detenido
+                or estado["muestras"] >= total_muestras):
+            terminado.set()
+            raise sd.CallbackStop
+    
+    with sd.InputStream(samplerate=fs, channels=1, blocksize=tamano_bloque,
+                        dtype='float32', callback=callback):
+        terminado.wait(timeout=duracion_max + 1)
+    
+    # Sin voz no hay nada que transcribir (evita que Whisper "transcriba" el silencio)
+    if not estado["hubo_voz"]:
+        if cola_fragmentos is not None:
+            cola_fragmentos.put(None)
+        print("Grabación finalizada (no se detectó voz).")
+        return grabacion[:0]
+    
+    if cola_fragmentos is not None:
+        # El último fragmento solo se envía si tiene voz (o si es el único)
+        resto = grabacion[estado["inicio_fragmento"]:estado["muestras"]]
+        if estado["inicio_fragmento"] == 0 or np.any(np.abs(resto) >= umbral_silencio):
+            cola_fragmentos.put(_recortar_silencio_final(resto, umbral_silencio))
+        cola_fragmentos.put(None)
     
     print("Grabación finalizada.")
-    return grabacion
+    return _recortar_silencio_final(grabacion[:estado["muestras"]], umbral_silencio)
 
-def grabar_y_transcribir(modelo_whisper="base"):
+def grabar_y_transcribir(modelo_whisper="base", por_lotes=False, detener=None):
     """
     Graba audio desde el micrófono y lo transcribe a texto.
     
+    La transcripción se hace por fragmentos en un hilo aparte mientras se sigue
+    grabando, de modo que al detectar el silencio final solo queda por
+    transcribir el último fragmento. Con la transcripción por lotes se espera a
+    tener la grabación completa, que es lo que permite decodificar varios
+    segmentos a la vez.
+    
     Args:
         modelo_whisper (str): Tamaño del modelo de Whisper a utilizar.
+        por_lotes (bool): Si es True, transcribe por lotes con faster-whisper.
+        detener (threading.Event, opcional): Si se activa, se deja de grabar y de
+            transcribir.
         
     Returns:
         str: Texto transcrito del audio grabado.
     """
-    # Crear directorio temporal si no existe
-    os.makedirs('temp', exist_ok=True)
+    # El modelo solo se carga la primera vez
+    transcriptor = get_transcriptor(modelo_whisper, por_lotes)
     
-    # Grabar audio
-    fs = 16000  # Frecuencia de muestreo
-    grabacion = grabar_audio(duracion_max=15, fs=fs)
+    # La transcripción por lotes necesita la grabación completa: con fragmentos de
+    # pocos segundos el VAD solo daría uno o dos segmentos y no habría lote
+    if isinstance(transcriptor, WhisperTranscriptorPorLotes):
+        grabacion = grabar_audio(duracion_max=15, fs=FRECUENCIA_GRABACION, detener=detener)
+        if not grabacion.size or (detener is not None and detener.is_set()):
+            return ""
+        return transcriptor.transcribir_archivo(grabacion).strip()
     
-    # Guardar la grabación en un archivo temporal
-    archivo_temp = os.path.join('temp', 'grabacion_temp.wav')
-    write(archivo_temp, fs, grabacion)
+    cola_fragmentos = queue.Queue()
+    partes = []
+    errores = []
     
-    # Transcribir el audio
-    transcriptor = WhisperTranscriptor(modelo=modelo_whisper)
-    texto = transcriptor.transcribir_archivo(archivo_temp)
+    def transcribir_fragmentos():
+        try:
+            while True:
+                fragmento = cola_fragmentos.get()
+                if fragmento is None or (detener is not None and detener.is_set()):
+                    break
+                if fragmento.size:
+                    # El texto anterior sirve de contexto para el siguiente fragmento
+                    texto_previo = " ".join(partes) or None
+                    texto = transcriptor.transcribir_archivo(fragmento, texto_previo=texto_previo).strip()
+                    if texto:
+                        partes.append(texto)
+        except Exception as e:
+            errores.append(e)
     
-    # Limpiar el archivo temporal
+    hilo = threading.Thread(target=transcribir_fragmentos, daemon=True)
+    hilo.start()
+    
+    # Grabar audio (directamente en memoria, sin pasar por un WAV temporal)
     try:
-        os.remove(archivo_temp)
-    except:
-        pass
+        grabar_audio(duracion_max=15, fs=FRECUENCIA_GRABACION, cola_fragmentos=cola_fragmentos,
+                     detener=detener)
+    except BaseException:
+        # Despertar al hilo de transcripción para que termine
+        cola_fragmentos.put(None)
+        raise
+    hilo.join()
+    
+    if errores:
+        raise errores[0]
     
-    return texto
+    return " ".join(partes)
 
 if __name__ == "__main__":
     # Prueba del módulo